@@ -1,15 +1,455 @@
 import argparse
+import asyncio
+import functools
+import hashlib
+import inspect
+import itertools
 import json
+import logging
+import math
+import operator
 import shlex
-import urllib.parse
+import sys
+import threading
+import time
+import weakref
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from http.cookiejar import DefaultCookiePolicy
+from types import MappingProxyType
+from urllib.parse import urlsplit
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
+# The curl commands equivalent to each request are logged at DEBUG level.
+# They are only built when that level is enabled, which main() does for
+# the command-line tool.
+logger = logging.getLogger(__name__)
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Number of seconds to wait for the FOLIO host to connect or to send data
+# before a request fails, unless the caller passes its own timeout.
+TIMEOUT = 10
+
+
+# Maximum number of requests per second sent through the shared session,
+# across all threads, or None for no limit. Read before every request.
+RATE_LIMIT = None
+
+# Number of seconds to hold requests for after FOLIO reports that no
+# requests are left in its rate limit window without saying for how long
+RATE_LIMIT_PAUSE = 1
+
+
+class _TokenBucket:
+    """A thread-safe token bucket limiting the rate of requests.
+    Each request takes a token. Tokens are added at RATE_LIMIT per second,
+    up to one second's worth, so short bursts are allowed. Requests can
+    also be held for a while with pause, e.g. when the server asks for it.
+    """
+
+    def __init__(self):
+        # Starts full, capped at one second's worth on first use
+        self._tokens = math.inf
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a request may be sent."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                wait = self._paused_until - now
+                rate = RATE_LIMIT
+                if rate is not None:
+                    elapsed = now - self._updated
+                    self._tokens = min(self._tokens + elapsed * rate, rate)
+                    self._updated = now
+                    if wait <= 0 and self._tokens < 1:
+                        wait = (1 - self._tokens) / rate
+                if wait <= 0:
+                    if rate is not None:
+                        self._tokens -= 1
+                    return
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """Holds all requests for the given number of seconds."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+def _retry_after(headers):
+    """Returns the number of seconds a Retry-After header asks to wait for.
+    Falls back to RATE_LIMIT_PAUSE when the header is missing or is an
+    HTTP date rather than a number of seconds.
+    """
+    try:
+        return max(float(headers['Retry-After']), 0)
+    except (KeyError, ValueError):
+        return RATE_LIMIT_PAUSE
+
+
+class _FolioAdapter(HTTPAdapter):
+    """An HTTPAdapter for the requests to FOLIO.
+    Applies TIMEOUT to requests sent without one, and waits for the rate
+    limiter before sending each request. When a response says that no
+    requests are left in FOLIO's rate limit window, all requests are held
+    for as long as the response asks.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.rate_limiter = _TokenBucket()
+
+    def send(self, request, timeout=None, **kwargs):
+        if timeout is None:
+            timeout = TIMEOUT
+        self.rate_limiter.acquire()
+        response = super().send(request, timeout=timeout, **kwargs)
+        if response.headers.get('X-RateLimit-Remaining') == '0':
+            self.rate_limiter.pause(_retry_after(response.headers))
+        return response
+
+
+class _FolioSession(requests.Session):
+    """A Session that reads its settings from the environment once per host.
+    requests looks through every environment variable for proxy settings
+    before each request, which costs more than preparing the request
+    itself. The environment of the process isn't expected to change, so
+    the settings found for a scheme and host are reused.
+
+    The session keeps no cookies. Requests are authenticated with the
+    X-Okapi-Token header, and a login cookie kept in the shared session
+    would be sent along with the requests of every other user and tenant.
+    auth reads the token from the cookies of its own response instead.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._environment_settings = {}
+        self.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+
+    def merge_environment_settings(self, url, proxies, stream, verify, cert):
+        if proxies or not self.trust_env:
+            return super().merge_environment_settings(
+                url, proxies, stream, verify, cert
+            )
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.netloc, stream, verify, cert)
+        settings = self._environment_settings.get(key)
+        if settings is None:
+            settings = super().merge_environment_settings(url, {}, stream, verify, cert)
+            self._environment_settings[key] = settings
+        # requests may add to the proxies, so each request gets a copy
+        return {**settings, 'proxies': dict(settings['proxies'])}
+
+
+# Shared session so that connections to the FOLIO host are kept alive
+# and reused instead of doing a new TCP+TLS handshake for every request.
+# The adapter fails stalled connections after TIMEOUT instead of hanging
+# a worker, and spaces out requests to stay within FOLIO's rate limit.
+_SESSION = _FolioSession()
+_ADAPTER = _FolioAdapter(
+    pool_connections=4,
+    # The largest default thread pool asyncio.to_thread uses, so gathered
+    # *_async lookups each get a connection
+    pool_maxsize=32,
+    # Threads beyond pool_maxsize wait for a pooled connection instead of
+    # opening extra ones that are thrown away after a single request
+    pool_block=True,
+    # Rate limiting and server errors are retried with exponential backoff
+    max_retries=Retry(
+        total=5,
+        backoff_factor=0.3,
+        status_forcelist=[429, 500, 502, 503, 504],
+        # Includes the login POST, which only issues a token
+        allowed_methods=frozenset(['GET', 'POST']),
+        respect_retry_after_header=True,
+        # Once the retries run out the last response is returned, so the
+        # lookups handle it like any other error response
+        raise_on_status=False,
+    ),
+)
+_SESSION.mount('https://', _ADAPTER)
+_SESSION.mount('http://', _ADAPTER)
+
+# Headers that are the same for every request. The tenant and token are
+# added per call since they can differ between calls. Read-only, since
+# it is shared by all requests.
+_BASE_HEADERS = MappingProxyType(
+    {'Accept': 'application/json', 'Content-Type': 'application/json'}
+)
+
+# The curl options for _BASE_HEADERS, quoted once for all curl commands
+_CURL_BASE_HEADERS = ' '.join(
+    f"-H {shlex.quote(f'{name}: {value}')}" for name, value in _BASE_HEADERS.items()
+)
+
+# Paths of the API endpoints, relative to the base URL
+_LOGIN_PATH = '/authn/login-with-expiry'
+_INSTANCES_PATH = '/instance-storage/instances'
+_HOLDINGS_PATH = '/holdings-storage/holdings'
+_ITEMS_PATH = '/item-storage/items'
+
+# Translation table escaping the characters that have a special meaning
+# inside a quoted CQL string
+_CQL_ESCAPES = str.maketrans(
+    {'\\': '\\\\', '"': '\\"', '*': '\\*', '?': '\\?', '^': '\\^'}
+)
+
+# Gets the ID of a record. Mapping it over a record list does the lookups
+# in C rather than in a Python-level loop.
+_GET_ID = operator.itemgetter('id')
+
+# An item and the holding and instance it belongs to, as returned by
+# get_item_refs. One small tuple per item is cheaper to build and to walk
+# through than the nested lists returned by get_records.
+ItemRef = namedtuple('ItemRef', 'instance_id holding_id item_id')
+
+# The caches copy the four settings below when the module is imported, so
+# assigning them afterwards has no effect. To change them at runtime, set
+# ttl and maxsize on auth.cache, get_holdings.cache or get_items.cache.
+
+# Number of seconds a token returned by auth is reused for. FOLIO access
+# tokens expire after ten minutes by default, so this stays within that.
+TOKEN_TTL = 300
+
+# Maximum number of tokens kept by auth. The least recently used token
+# is dropped when a new one is added.
+TOKEN_CACHE_SIZE = 32
+
+# Number of seconds the holding IDs of an instance, and the item IDs of a
+# holding, are reused for by get_holdings and get_items
+LOOKUP_TTL = 60
+
+# Maximum number of results kept by get_holdings and get_items each
+LOOKUP_CACHE_SIZE = 4096
+
+# Maximum number of requests the batch lookups send in parallel. Kept
+# below the adapter's pool_maxsize so every worker gets a pooled
+# connection.
+MAX_WORKERS = 16
+
+# Maximum number of *_async lookups running at once in one event loop.
+# Matches the session's pool_maxsize, beyond which requests would only
+# wait for a connection.
+ASYNC_CONCURRENCY = 32
+
+# Number of seconds ItemsLoader collects holding IDs for before looking
+# up their items in one batch
+LOADER_DELAY = 0.01
+
+# One semaphore per event loop, since get_records starts a new loop for
+# every call
+_ASYNC_SEMAPHORES = weakref.WeakKeyDictionary()
+
+# Number of IDs combined into a single CQL query by the batch lookups.
+# Keeps the request URL comfortably below common server length limits.
+BATCH_SIZE = 50
+
+# Number of records requested per page by the batch lookups. Larger
+# result sets are fetched page by page so that only one page of decoded
+# JSON is held in memory at a time.
+PAGE_SIZE = 1000
+
+
+@functools.lru_cache(maxsize=1)
+def _auth_headers(token, tenant):
+    """Returns the headers of an authenticated request.
+    The headers of the last token and tenant are kept, so consecutive
+    requests for the same user share one read-only mapping instead of
+    each building a dict.
+
+    Args:
+        token (str): The token of the user.
+        tenant (str): The tenant of the user.
+
+    Returns:
+        Mapping[str, str]: _BASE_HEADERS with the tenant and token added.
+    """
+    return MappingProxyType(
+        {**_BASE_HEADERS, 'X-Okapi-Tenant': tenant, 'X-Okapi-Token': token}
+    )
+
+
+def _loads(response):
+    """Parses the body of a response as JSON.
+    Uses orjson when it is installed, which decodes large holdings and
+    items responses considerably faster than the standard library.
+    Without it the body bytes are decoded by json.loads, which detects
+    their encoding itself instead of decoding them to text first like
+    response.json() does. orjson.JSONDecodeError is a subclass of
+    json.JSONDecodeError, so callers only need to handle the latter.
+    """
+    if orjson is None:
+        return json.loads(response.content)
+    return orjson.loads(response.content)
+
+
+class _TTLCache:
+    """A thread-safe least recently used cache whose entries expire.
+    Entries are dropped ttl seconds after they were set, and the least
+    recently used entry is dropped when more than maxsize are kept. Both
+    attributes can be changed on a live cache; a new ttl applies to the
+    entries set after the change.
+    """
+
+    def __init__(self, ttl, maxsize):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        # Values are (value, time.monotonic() deadline)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Returns the value cached for key, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value, ttl=None):
+        """Caches value for key, for ttl seconds instead of self.ttl if given."""
+        if ttl is None:
+            ttl = self.ttl
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard_if(self, predicate):
+        """Drops the entries whose value predicate returns True for."""
+        with self._lock:
+            for key, (value, _) in list(self._entries.items()):
+                if predicate(value):
+                    del self._entries[key]
+
+    def clear(self):
+        """Drops all entries."""
+        with self._lock:
+            self._entries.clear()
+
+
+def _cache_tokens(auth_func):
+    """Decorates auth to reuse the tokens of successful logins.
+    auth_func returns the token and the seconds until it expires, or None
+    if the login response doesn't say, and the wrapper returns the token.
+    Tokens are kept until they expire, at most TOKEN_TTL seconds, keyed by
+    (url, username, tenant), in a least recently used cache of
+    TOKEN_CACHE_SIZE entries. The password itself is not stored; a cached
+    token is only returned when a SHA-256 digest of the password matches
+    the one it was issued for. Failed logins are not cached, and
+    wrapper.invalidate(token) drops a token FOLIO has rejected.
+    """
+    # Values are (token, password digest)
+    cache = _TTLCache(TOKEN_TTL, TOKEN_CACHE_SIZE)
+
+    @functools.wraps(auth_func)
+    def wrapper(url, username, password, tenant):
+        key = (url, username, tenant)
+        password_digest = hashlib.sha256(password.encode()).digest()
+        cached = cache.get(key)
+        if cached is not None and cached[1] == password_digest:
+            return cached[0]
+
+        token, lifetime = auth_func(url, username, password, tenant)
+        if token is not None:
+            ttl = cache.ttl if lifetime is None else min(cache.ttl, lifetime)
+            cache.set(key, (token, password_digest), ttl)
+        return token
+
+    def invalidate(token):
+        """Drops the cached logins that returned token."""
+        cache.discard_if(lambda value: value[0] == token)
+
+    wrapper.cache = cache
+    wrapper.cache_clear = cache.clear
+    wrapper.invalidate = invalidate
+    return wrapper
+
+
+def _cache_lookups(lookup_func):
+    """Decorates get_holdings and get_items to reuse recent results.
+    Results are kept for LOOKUP_TTL seconds, keyed by (url, ID, tenant), in
+    a least recently used cache of LOOKUP_CACHE_SIZE entries. The token is
+    not part of the key, since the records belong to the tenant rather than
+    to the user. Empty and failed lookups are not cached, and each caller
+    gets its own copy of the cached list. The cache is shared with
+    get_holdings_batch and get_items_batch.
+    """
+    cache = _TTLCache(LOOKUP_TTL, LOOKUP_CACHE_SIZE)
+    # The ID parameter is named after the record, so the arguments are
+    # bound to the signature to accept them by keyword as well
+    signature = inspect.signature(lookup_func)
+
+    @functools.wraps(lookup_func)
+    def wrapper(*args, **kwargs):
+        token, url, record_id, tenant = signature.bind(*args, **kwargs).args
+        key = (url, record_id, tenant)
+        cached = cache.get(key)
+        if cached is not None:
+            return list(cached)
+
+        ids = lookup_func(token, url, record_id, tenant)
+        if ids:
+            cache.set(key, tuple(ids))
+        return ids
+
+    wrapper.cache = cache
+    wrapper.cache_clear = cache.clear
+    return wrapper
+
+
+def _token_lifetime(response):
+    """Returns the seconds until the token of a login response expires.
+    Reads the accessTokenExpiration that login-with-expiry returns in the
+    body, or returns None if it is missing or can't be parsed.
+    """
+    try:
+        expiration = _loads(response).get('accessTokenExpiration')
+        expires_at = datetime.fromisoformat(expiration.replace('Z', '+00:00'))
+    except (json.JSONDecodeError, AttributeError, ValueError):
+        return None
+    if expires_at.tzinfo is None:
+        expires_at = expires_at.replace(tzinfo=timezone.utc)
+    return (expires_at - datetime.now(timezone.utc)).total_seconds()
+
+
+def _drop_rejected_token(response, token):
+    """Drops token from the auth cache if FOLIO rejected it with a 401.
+    Otherwise auth would keep returning a revoked token until it expires
+    from the cache.
+    """
+    if response.status_code == 401:
+        auth.invalidate(token)
+
+
+@_cache_tokens
 def auth(url, username, password, tenant):
     """Authenticates a user and returns a token.
     Sends a POST request to the given URL with the given username, password, and tenant.
-    Extracts the token from the response headers and returns it.
+    Extracts the token from the response cookies and returns it.
+
+    Tokens are cached until they expire, for at most TOKEN_TTL seconds, so
+    calling auth again with the same credentials within that time returns
+    the cached token without logging in again. Tokens FOLIO rejects with a
+    401 are dropped from the cache. Call auth.cache_clear() to drop all
+    cached tokens.
 
     Args:
         url (str): The base URL of the API.
@@ -20,21 +460,52 @@ def auth(url, username, password, tenant):
     Returns:
         str: The token of the user, or None if authentication failed.
     """
-    endpoint = '/authn/login-with-expiry'
-    headers = {
-        'Accept': 'application/json',
-        'Content-Type': 'application/json',
-        'X-Okapi-Tenant': tenant,
-    }
+    login_url = f'{url}{_LOGIN_PATH}'
+    headers = {**_BASE_HEADERS, 'X-Okapi-Tenant': tenant}
     data = {'username': username, 'password': password}
-    response = requests.post(f'{url}{endpoint}', headers=headers, json=data)
+    response = _SESSION.post(login_url, headers=headers, json=data)
     token = response.cookies.get('folioAccessToken')
 
-    # Print the curl command for debugging
-    curl_string = f"curl -w '\\n' -X POST -H {shlex.quote('Accept: application/json')} -H {shlex.quote('Content-Type: application/json')} -H {shlex.quote(f'X-Okapi-Tenant: {tenant}')} '{url}{endpoint}' -d {shlex.quote(json.dumps(data))} --include"
-    print(curl_string)
+    # Log the curl command for debugging
+    if logger.isEnabledFor(logging.DEBUG):
+        curl_string = f"curl -w '\\n' -X POST {_CURL_BASE_HEADERS} -H {shlex.quote(f'X-Okapi-Tenant: {tenant}')} {shlex.quote(login_url)} -d {shlex.quote(json.dumps(data))} --include"
+        logger.debug(curl_string)
 
-    return token
+    if token is None:
+        return None, None
+    return token, _token_lifetime(response)
+
+
+@functools.lru_cache(maxsize=None)
+def _cql_template(field):
+    """Returns a function that builds the query for field from its terms.
+    Only the terms vary between lookups of the same field, so the rest of
+    the query is built once per field and filled in with str.format.
+    """
+    return f'({field}=={{}} NOT discoverySuppress==true)'.format
+
+
+def _cql_query(field, value):
+    """Builds a CQL query matching value exactly on field.
+    The value is converted to a string and escaped, so HRIDs containing
+    quotes, backslashes or CQL wildcard characters are matched literally.
+    """
+    return _cql_template(field)(f'"{str(value).translate(_CQL_ESCAPES)}"')
+
+
+def _curl_get(request_url, tenant, token):
+    """Builds a curl command equivalent to an authenticated GET request.
+
+    Args:
+        request_url (str): The full URL of the request, including the
+            query string exactly as it was sent.
+        tenant (str): The tenant of the user.
+        token (str): The token of the user.
+
+    Returns:
+        str: The curl command.
+    """
+    return f"curl -w '\\n' {_CURL_BASE_HEADERS} -H {shlex.quote(f'X-Okapi-Tenant: {tenant}')} -H {shlex.quote(f'X-Okapi-Token: {token}')} {shlex.quote(request_url)}"
 
 
 def get_instances(token, url, hrid, tenant):
@@ -51,43 +522,37 @@ def get_instances(token, url, hrid, tenant):
     Returns:
         list[str]: The IDs of the instances, or an empty list if no instances were found.
     """
-    headers = {
-        'Accept': 'application/json',
-        'Content-Type': 'application/json',
-        'X-Okapi-Tenant': tenant,
-        'X-Okapi-Token': token,
+    headers = _auth_headers(token, tenant)
+    params = {
+        'query': _cql_query('hrid', hrid),
+        'limit': PAGE_SIZE,
     }
-    params = {'query': f'(hrid=="{hrid}" NOT discoverySuppress==true)'}
-    response = requests.get(
-        f'{url}/instance-storage/instances', headers=headers, params=params
-    )
+    response = _SESSION.get(f'{url}{_INSTANCES_PATH}', headers=headers, params=params)
+    _drop_rejected_token(response, token)
+
+    # Log the curl command for debugging
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(_curl_get(response.request.url, tenant, token))
+
     try:
-        response_json = response.json()
-    except json.decoder.JSONDecodeError:
-        print(
-            "Error: Failed to parse response as JSON. You probably don't have access to okapi."
+        response_json = _loads(response)
+    except json.JSONDecodeError:
+        logger.error(
+            "Failed to parse response as JSON. You probably don't have access to okapi."
         )
         return []
 
-    # Check if the instances list is not empty
-    if response_json['instances']:
-        ids = [instance['id'] for instance in response_json['instances']]
-    else:
-        ids = []
-
-    # Print the curl command for debugging
-    # URL-encode the query parameter
-    query = urllib.parse.quote_plus(params['query'])
-    curl_string = f"curl -w '\\n' -H {shlex.quote('Accept: application/json')} -H {shlex.quote('Content-Type: application/json')} -H {shlex.quote(f'X-Okapi-Tenant: {tenant}')} -H {shlex.quote(f'X-Okapi-Token: {token}')} '{url}/instance-storage/instances?query={query}'"
-    print(curl_string)
-
-    return ids
+    # Return early if the instances list is missing or empty
+    instances = response_json.get('instances')
+    if not instances:
+        return []
+    return list(map(_GET_ID, instances))
 
 
+@_cache_lookups
 def get_holdings(token, url, instance_id, tenant):
     """Gets a list of holding IDs for a given instance ID.
-    Sends a GET request to the given URL with the given token, instance_id, and tenant.
-    Parses the response body as JSON and returns a list of holding IDs.
+    Collects the holding IDs yielded by iter_holdings into a list.
 
     Args:
         token (str): The token of the user.
@@ -96,41 +561,385 @@ def get_holdings(token, url, instance_id, tenant):
         tenant (str): The tenant of the user.
 
     Returns:
-        list[str]: A list of holding IDs, or None if no holdings were found.
+        list[str]: A list of holding IDs, or None if the response could not be parsed.
     """
-    headers = {
-        'Accept': 'application/json',
-        'Content-Type': 'application/json',
-        'X-Okapi-Tenant': tenant,
-        'X-Okapi-Token': token,
-    }
-    params = {'query': f'(instanceId=="{instance_id}" NOT discoverySuppress==true)'}
     try:
-        response = requests.get(
-            f'{url}/holdings-storage/holdings', headers=headers, params=params
-        )
-        response_json = response.json()
+        return list(iter_holdings(token, url, instance_id, tenant))
     except json.JSONDecodeError:
-        print(
-            "Error: Failed to parse response as JSON. You probably don't have access to okapi."
+        logger.error(
+            "Failed to parse response as JSON. You probably don't have access to okapi."
         )
         return None
 
-    id_list = [holding['id'] for holding in response_json['holdingsRecords']]
 
-    # Print the curl command for debugging
-    # URL-encode the query parameter
-    query = urllib.parse.quote_plus(params['query'])
-    curl_string = f"curl -w '\\n' -H {shlex.quote('Accept: application/json')} -H {shlex.quote('Content-Type: application/json')} -H {shlex.quote(f'X-Okapi-Tenant: {tenant}')} -H {shlex.quote(f'X-Okapi-Token: {token}')} '{url}/holdings-storage/holdings?query={query}'"
-    print(curl_string)
+@_cache_lookups
+def get_items(token, url, holding_id, tenant):
+    """Gets a list of item IDs for a given holding ID.
+    Collects the item IDs yielded by iter_items into a list.
 
-    return id_list
+    Args:
+        token (str): The token of the user.
+        url (str): The base URL of the API.
+        holding_id (str): The ID of the holding.
+        tenant (str): The tenant of the user.
 
+    Returns:
+        list[str]: A list of item IDs, or an empty list if no items were found.
+    """
+    try:
+        return list(iter_items(token, url, holding_id, tenant))
+    except json.JSONDecodeError:
+        logger.error("Response body could not be parsed as JSON")
+        return []
 
-def get_items(token, url, holding_id, tenant):
-    """Gets a list of item IDs for a given holding ID.
-    Sends a GET request to the given URL with the given token, holding_id, and tenant.
-    Parses the response body as JSON and returns a list of item IDs.
+
+def _batch_query(field, ids):
+    """Builds a CQL query matching any of the given IDs on field.
+    The IDs are converted to strings, so uuid.UUID values can be passed.
+    """
+    any_of = '" or "'.join([str(id_).translate(_CQL_ESCAPES) for id_ in ids])
+    return _cql_template(field)(f'("{any_of}")')
+
+
+def _iter_pages(token, url, path, key, query, tenant):
+    """Yields the records matching a CQL query, one page at a time.
+    Requests PAGE_SIZE records per page, sorted by ID, and keeps going
+    until a short page is returned. Each page is decoded and released
+    before the next one is requested.
+
+    Args:
+        token (str): The token of the user.
+        url (str): The base URL of the API.
+        path (str): The path of the storage endpoint.
+        key (str): The key of the record list in the response body.
+        query (str): The CQL query.
+        tenant (str): The tenant of the user.
+
+    Yields:
+        list[dict]: The records in each response body.
+
+    Raises:
+        json.JSONDecodeError: If a response body is not valid JSON.
+    """
+    headers = _auth_headers(token, tenant)
+    endpoint = f'{url}{path}'
+    # Without a sort order FOLIO may return the records in a different
+    # order for each page, skipping or repeating records between pages
+    query = f'{query} sortBy id'
+    offset = 0
+    while True:
+        params = {'query': query, 'limit': PAGE_SIZE, 'offset': offset}
+        response = _SESSION.get(endpoint, headers=headers, params=params)
+        _drop_rejected_token(response, token)
+
+        # Log the curl command for debugging
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(_curl_get(response.request.url, tenant, token))
+
+        records = _loads(response).get(key) or []
+        yield records
+        if len(records) < PAGE_SIZE:
+            return
+        offset += PAGE_SIZE
+
+
+def _iter_records(token, url, path, key, query, tenant):
+    """Returns an iterator over the records of all pages from _iter_pages.
+    The pages are chained together in C, so the records are handed out
+    without resuming a Python generator for each one.
+
+    Args:
+        token (str): The token of the user.
+        url (str): The base URL of the API.
+        path (str): The path of the storage endpoint.
+        key (str): The key of the record list in the response body.
+        query (str): The CQL query.
+        tenant (str): The tenant of the user.
+
+    Returns:
+        Iterator[dict]: The records in the response bodies.
+    """
+    pages = _iter_pages(token, url, path, key, query, tenant)
+    return itertools.chain.from_iterable(pages)
+
+
+def iter_holdings(token, url, instance_id, tenant):
+    """Returns an iterator over the holding IDs for a given instance ID.
+    Holdings are requested PAGE_SIZE at a time, so the IDs of the first
+    page can be used before the next one is requested, and an instance with
+    many holdings never needs them all in memory at once.
+
+    Args:
+        token (str): The token of the user.
+        url (str): The base URL of the API.
+        instance_id (str): The ID of the instance.
+        tenant (str): The tenant of the user.
+
+    Returns:
+        Iterator[str]: The holding IDs.
+
+    Raises:
+        json.JSONDecodeError: While iterating, if a response body is not
+            valid JSON.
+    """
+    query = _cql_query('instanceId', instance_id)
+    records = _iter_records(
+        token, url, _HOLDINGS_PATH, 'holdingsRecords', query, tenant
+    )
+    return map(_GET_ID, records)
+
+
+def iter_items(token, url, holding_id, tenant):
+    """Returns an iterator over the item IDs for a given holding ID.
+    Items are requested PAGE_SIZE at a time, like in iter_holdings.
+
+    Args:
+        token (str): The token of the user.
+        url (str): The base URL of the API.
+        holding_id (str): The ID of the holding.
+        tenant (str): The tenant of the user.
+
+    Returns:
+        Iterator[str]: The item IDs.
+
+    Raises:
+        json.JSONDecodeError: While iterating, if a response body is not
+            valid JSON.
+    """
+    query = _cql_query('holdingsRecordId', holding_id)
+    records = _iter_records(token, url, _ITEMS_PATH, 'items', query, tenant)
+    return map(_GET_ID, records)
+
+
+def _get_batch(token, url, path, key, field, ids, tenant, cache=None):
+    """Looks up the records whose field matches any of the given IDs.
+    IDs are sent BATCH_SIZE at a time, one query per batch, and the
+    record IDs in the response are grouped by the value of field. When
+    there is more than one batch the queries run in up to MAX_WORKERS
+    threads. With a cache, the IDs it has results for are not queried,
+    and the non-empty results of the others are added to it.
+
+    Args:
+        token (str): The token of the user.
+        url (str): The base URL of the API.
+        path (str): The path of the storage endpoint.
+        key (str): The key of the record list in the response body.
+        field (str): The field that links a record to its parent.
+        ids (list[str]): The parent IDs to look up.
+        tenant (str): The tenant of the user.
+        cache (_TTLCache): The cache of record IDs keyed by (url, parent
+            ID, tenant), or None.
+
+    Returns:
+        dict[str, list[str]]: Record IDs keyed by parent ID, in the order of
+        ids. Parent IDs are matched regardless of case.
+    """
+    parent_and_id = operator.itemgetter(field, 'id')
+
+    def fetch(batch):
+        # Reduce the records to (parent ID, record ID) pairs as they are
+        # read from each page, without keeping the records themselves
+        query = _batch_query(field, batch)
+        records = _iter_records(token, url, path, key, query, tenant)
+        pairs = []
+        try:
+            pairs.extend(map(parent_and_id, records))
+        except json.JSONDecodeError:
+            # Keep the pairs of the pages read before the bad one, but
+            # report the batch as incomplete
+            logger.error("Response body could not be parsed as JSON")
+            return pairs, False
+        return pairs, True
+
+    grouped = {id_: [] for id_ in ids}
+    missing = list(grouped)
+    if cache is not None:
+        missing = []
+        for id_ in grouped:
+            cached = cache.get((url, id_, tenant))
+            if cached is None:
+                missing.append(id_)
+            else:
+                grouped[id_] = list(cached)
+
+    batches = [
+        missing[start : start + BATCH_SIZE]
+        for start in range(0, len(missing), BATCH_SIZE)
+    ]
+    if len(batches) > 1:
+        # The queries for the batches are independent, so run them in
+        # parallel over the session's connection pool
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            results = list(executor.map(fetch, batches))
+    else:
+        results = [fetch(batch) for batch in batches]
+
+    # FOLIO matches IDs and HRIDs regardless of case, so a record can name
+    # its parent in another case than it was asked for. Records are added
+    # to the lists of every requested ID that matches that way.
+    matching = {}
+    for id_ in missing:
+        matching.setdefault(str(id_).casefold(), []).append(grouped[id_])
+    for pairs, _ in results:
+        for parent_id, record_id in pairs:
+            lists = matching.get(parent_id.casefold())
+            if lists is None:
+                logger.warning(
+                    "Skipping %s with unexpected %s %s", record_id, field, parent_id
+                )
+                continue
+            for record_ids in lists:
+                record_ids.append(record_id)
+
+    if cache is not None:
+        # Only complete results are cached, not those of a batch with a
+        # page that could not be read
+        for batch, (_, complete) in zip(batches, results):
+            if not complete:
+                continue
+            for id_ in batch:
+                if grouped[id_]:
+                    cache.set((url, id_, tenant), tuple(grouped[id_]))
+    return grouped
+
+
+def get_instances_batch(token, url, hrids, tenant):
+    """Gets the instance IDs for several HRIDs at once.
+    Sends one query per BATCH_SIZE HRIDs instead of one per HRID.
+
+    Args:
+        token (str): The token of the user.
+        url (str): The base URL of the API.
+        hrids (list[str]): The HRIDs of the instances.
+        tenant (str): The tenant of the user.
+
+    Returns:
+        dict[str, list[str]]: Instance IDs keyed by HRID. HRIDs without a
+        matching instance map to an empty list.
+    """
+    return _get_batch(token, url, _INSTANCES_PATH, 'instances', 'hrid', hrids, tenant)
+
+
+def get_holdings_batch(token, url, instance_ids, tenant):
+    """Gets the holding IDs for several instance IDs at once.
+    Sends one query per BATCH_SIZE instance IDs instead of one per
+    instance ID. Shares its cache with get_holdings, so instances looked
+    up recently are not queried again.
+
+    Args:
+        token (str): The token of the user.
+        url (str): The base URL of the API.
+        instance_ids (list[str]): The IDs of the instances.
+        tenant (str): The tenant of the user.
+
+    Returns:
+        dict[str, list[str]]: Holding IDs keyed by instance ID. Instances without
+        holdings map to an empty list.
+    """
+    return _get_batch(
+        token,
+        url,
+        _HOLDINGS_PATH,
+        'holdingsRecords',
+        'instanceId',
+        instance_ids,
+        tenant,
+        cache=get_holdings.cache,
+    )
+
+
+def get_items_batch(token, url, holding_ids, tenant):
+    """Gets the item IDs for several holding IDs at once.
+    Sends one query per BATCH_SIZE holding IDs instead of one per
+    holding ID. Shares its cache with get_items, so holdings looked up
+    recently are not queried again.
+
+    Args:
+        token (str): The token of the user.
+        url (str): The base URL of the API.
+        holding_ids (list[str]): The IDs of the holdings.
+        tenant (str): The tenant of the user.
+
+    Returns:
+        dict[str, list[str]]: Item IDs keyed by holding ID. Holdings without
+        items map to an empty list.
+    """
+    return _get_batch(
+        token,
+        url,
+        _ITEMS_PATH,
+        'items',
+        'holdingsRecordId',
+        holding_ids,
+        tenant,
+        cache=get_items.cache,
+    )
+
+
+async def _run_limited(func, *args):
+    """Runs a blocking lookup in a worker thread.
+    At most ASYNC_CONCURRENCY lookups run at once per event loop; the rest
+    wait for a slot, so gathering thousands of lookups doesn't queue them
+    all on the executor at once.
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = _ASYNC_SEMAPHORES.get(loop)
+    if semaphore is None:
+        semaphore = _ASYNC_SEMAPHORES[loop] = asyncio.Semaphore(ASYNC_CONCURRENCY)
+    async with semaphore:
+        return await asyncio.to_thread(func, *args)
+
+
+async def auth_async(url, username, password, tenant):
+    """Awaitable version of auth.
+    Runs the blocking request in a worker thread so that it doesn't block
+    the event loop.
+
+    Args:
+        url (str): The base URL of the API.
+        username (str): The username of the user.
+        password (str): The password of the user.
+        tenant (str): The tenant of the user.
+
+    Returns:
+        str: The token of the user, or None if authentication failed.
+    """
+    return await _run_limited(auth, url, username, password, tenant)
+
+
+async def get_instances_async(token, url, hrid, tenant):
+    """Awaitable version of get_instances.
+
+    Args:
+        token (str): The token of the user.
+        url (str): The base URL of the API.
+        hrid (str): The HRID of the instance.
+        tenant (str): The tenant of the user.
+
+    Returns:
+        list[str]: The IDs of the instances, or an empty list if no instances were found.
+    """
+    return await _run_limited(get_instances, token, url, hrid, tenant)
+
+
+async def get_holdings_async(token, url, instance_id, tenant):
+    """Awaitable version of get_holdings.
+
+    Args:
+        token (str): The token of the user.
+        url (str): The base URL of the API.
+        instance_id (str): The ID of the instance.
+        tenant (str): The tenant of the user.
+
+    Returns:
+        list[str]: A list of holding IDs, an empty list if no holdings were
+        found, or None if the response could not be parsed.
+    """
+    return await _run_limited(get_holdings, token, url, instance_id, tenant)
+
+
+async def get_items_async(token, url, holding_id, tenant):
+    """Awaitable version of get_items.
 
     Args:
         token (str): The token of the user.
@@ -141,43 +950,160 @@ def get_items(token, url, holding_id, tenant):
     Returns:
         list[str]: A list of item IDs, or an empty list if no items were found.
     """
-    headers = {
-        'Accept': 'application/json',
-        'Content-Type': 'application/json',
-        'X-Okapi-Tenant': tenant,
-        'X-Okapi-Token': token,
-    }
-    params = {
-        'query': f'(holdingsRecordId=="{holding_id}" NOT discoverySuppress==true)'
-    }
+    return await _run_limited(get_items, token, url, holding_id, tenant)
 
-    # Print the curl command for debugging
-    # URL-encode the query parameter
-    query = urllib.parse.quote_plus(params['query'])
-    curl_string = f"curl -w '\\n' -H {shlex.quote('Accept: application/json')} -H {shlex.quote('Content-Type: application/json')} -H {shlex.quote(f'X-Okapi-Tenant: {tenant}')} -H {shlex.quote(f'X-Okapi-Token: {token}')} {shlex.quote(url + '/item-storage/items?query=' + query)}"
-    print(curl_string)
 
-    # Send the request and parse the response
-    try:
-        response = requests.get(
-            f'{url}/item-storage/items', headers=headers, params=params
-        )
-        response_json = response.json()
-        id_list = [item['id'] for item in response_json['items']]
-    except json.JSONDecodeError:
-        print("Error: Response body could not be parsed as JSON")
-        id_list = []
+async def get_instances_batch_async(token, url, hrids, tenant):
+    """Awaitable version of get_instances_batch.
+
+    Args:
+        token (str): The token of the user.
+        url (str): The base URL of the API.
+        hrids (list[str]): The HRIDs of the instances.
+        tenant (str): The tenant of the user.
+
+    Returns:
+        dict[str, list[str]]: Instance IDs keyed by HRID.
+    """
+    return await _run_limited(get_instances_batch, token, url, hrids, tenant)
+
 
-    # Return the id_list
-    return id_list
+async def get_holdings_batch_async(token, url, instance_ids, tenant):
+    """Awaitable version of get_holdings_batch.
+
+    Args:
+        token (str): The token of the user.
+        url (str): The base URL of the API.
+        instance_ids (list[str]): The IDs of the instances.
+        tenant (str): The tenant of the user.
+
+    Returns:
+        dict[str, list[str]]: Holding IDs keyed by instance ID.
+    """
+    return await _run_limited(get_holdings_batch, token, url, instance_ids, tenant)
+
+
+async def get_items_batch_async(token, url, holding_ids, tenant):
+    """Awaitable version of get_items_batch.
+
+    Args:
+        token (str): The token of the user.
+        url (str): The base URL of the API.
+        holding_ids (list[str]): The IDs of the holdings.
+        tenant (str): The tenant of the user.
+
+    Returns:
+        dict[str, list[str]]: Item IDs keyed by holding ID.
+    """
+    return await _run_limited(get_items_batch, token, url, holding_ids, tenant)
+
+
+class ItemsLoader:
+    """Coalesces concurrent item lookups into batched queries.
+    Holding IDs passed to load are collected for LOADER_DELAY seconds and
+    then looked up together with get_items_batch_async, so concurrent
+    consumers of the same holdings share one request, and lookups of
+    different holdings share a CQL query. A loader belongs to the event
+    loop it is first used in.
+
+    Args:
+        token (str): The token of the user.
+        url (str): The base URL of the API.
+        tenant (str): The tenant of the user.
+        delay (float): The number of seconds to collect holding IDs for.
+            Defaults to LOADER_DELAY.
+    """
+
+    def __init__(self, token, url, tenant, delay=None):
+        self.token = token
+        self.url = url
+        self.tenant = tenant
+        self.delay = LOADER_DELAY if delay is None else delay
+        # Futures for the item IDs of the holdings waiting to be looked up
+        self._pending = {}
+        self._timer = None
+        # Keeps the running lookups from being garbage collected
+        self._tasks = set()
+
+    async def load(self, holding_id):
+        """Gets a list of item IDs for a given holding ID.
+
+        Args:
+            holding_id (str): The ID of the holding.
+
+        Returns:
+            list[str]: A list of item IDs, or an empty list if no items were found.
+        """
+        future = self._pending.get(holding_id)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self._pending[holding_id] = loop.create_future()
+            if self._timer is None:
+                self._timer = loop.call_later(self.delay, self._dispatch)
+        # Shielded, so a cancelled caller doesn't cancel the lookup for
+        # the others waiting on the same holding
+        return list(await asyncio.shield(future))
+
+    def _dispatch(self):
+        """Starts the lookup of the pending holding IDs."""
+        pending, self._pending, self._timer = self._pending, {}, None
+        task = asyncio.get_running_loop().create_task(self._fetch(pending))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _fetch(self, pending):
+        """Looks up the items of the given holdings and resolves their futures."""
+        try:
+            items = await get_items_batch_async(
+                self.token, self.url, list(pending), self.tenant
+            )
+        except Exception as exc:
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        for holding_id, future in pending.items():
+            if not future.done():
+                future.set_result(items[holding_id])
+
+
+def _lookup(url, username, password, tenant, hrid):
+    """Looks up the instances, holdings and items for a given HRID.
+    The holdings for all instances, and then the items for all holdings,
+    are looked up with batched queries. Stops as soon as a step finds
+    nothing.
+
+    Args:
+        url (str): The base URL of the API.
+        username (str): The username of the user.
+        password (str): The password of the user.
+        tenant (str): The tenant of the user.
+        hrid (str): The HRID of the instance.
+
+    Returns:
+        tuple: The list of instance IDs, the holding IDs keyed by instance
+        ID and the item IDs keyed by holding ID.
+    """
+    token = auth(url, username, password, tenant)
+    instance_ids = get_instances(token, url, hrid, tenant)
+    if not instance_ids:
+        return [], {}, {}
+    holdings = get_holdings_batch(token, url, instance_ids, tenant)
+    holding_ids = [h for instance_id in instance_ids for h in holdings[instance_id]]
+    if not holding_ids:
+        return instance_ids, holdings, {}
+    items = get_items_batch(token, url, holding_ids, tenant)
+    return instance_ids, holdings, items
 
 
 def get_records(url, username, password, tenant, hrid):
     """Gets a list of lists of item IDs for a given HRID.
     Authenticates the user and gets the token. Gets the instance IDs for
-    the given HRID. Gets a list of holding IDs for each instance ID.
-    Gets a list of item IDs for each holding ID. Returns a list of lists of item IDs,
-    where each list corresponds to a different holding ID.
+    the given HRID. Gets the holding IDs for all instance IDs, then the item
+    IDs for all holding IDs, using batched queries, so the number of
+    round-trips is one per BATCH_SIZE records instead of one per record.
+    Returns a list of lists of item IDs, where each list corresponds to a
+    different holding ID.
 
     Args:
         url (str): The base URL of the API.
@@ -189,37 +1115,214 @@ def get_records(url, username, password, tenant, hrid):
     Returns:
         list[list[str]]: A list of lists of item IDs, or an empty list if no records were found.
     """
+    instance_ids, holdings, items = _lookup(url, username, password, tenant, hrid)
+    return [
+        items[holding_id]
+        for instance_id in instance_ids
+        for holding_id in holdings[instance_id]
+    ]
+
+
+async def get_records_async(url, username, password, tenant, hrid):
+    """Awaitable version of get_records.
+    Runs the blocking lookups in a worker thread, so several HRIDs can be
+    looked up together with asyncio.gather.
+
+    Args:
+        url (str): The base URL of the API.
+        username (str): The username of the user.
+        password (str): The password of the user.
+        tenant (str): The tenant of the user.
+        hrid (str): The HRID of the instance.
+
+    Returns:
+        list[list[str]]: A list of lists of item IDs, or an empty list if no records were found.
+    """
+    return await _run_limited(get_records, url, username, password, tenant, hrid)
+
+
+def get_item_refs(url, username, password, tenant, hrid):
+    """Gets the items for a given HRID as a flat list.
+    Looks up the same records as get_records, but returns one ItemRef per
+    item, naming the instance and holding it belongs to, in the order
+    get_records would list them. Holdings without items are left out.
+
+    Args:
+        url (str): The base URL of the API.
+        username (str): The username of the user.
+        password (str): The password of the user.
+        tenant (str): The tenant of the user.
+        hrid (str): The HRID of the instance.
+
+    Returns:
+        list[ItemRef]: The items of the instances, or an empty list if no
+        items were found.
+    """
+    instance_ids, holdings, items = _lookup(url, username, password, tenant, hrid)
+    return [
+        ItemRef(instance_id, holding_id, item_id)
+        for instance_id in instance_ids
+        for holding_id in holdings[instance_id]
+        for item_id in items[holding_id]
+    ]
+
+
+async def get_item_refs_async(url, username, password, tenant, hrid):
+    """Awaitable version of get_item_refs.
+
+    Args:
+        url (str): The base URL of the API.
+        username (str): The username of the user.
+        password (str): The password of the user.
+        tenant (str): The tenant of the user.
+        hrid (str): The HRID of the instance.
+
+    Returns:
+        list[ItemRef]: The items of the instances, or an empty list if no
+        items were found.
+    """
+    return await _run_limited(get_item_refs, url, username, password, tenant, hrid)
+
+
+def get_records_threaded(url, username, password, tenant, hrid, max_workers=None):
+    """Gets a list of lists of item IDs for a given HRID, using threads.
+    Looks up the holdings of each instance, then the items of each
+    holding, with one get_holdings or get_items call per ID, run in a
+    thread pool. Unlike get_records this does not use asyncio, and the
+    per-ID lookups share the get_holdings and get_items caches.
+
+    Args:
+        url (str): The base URL of the API.
+        username (str): The username of the user.
+        password (str): The password of the user.
+        tenant (str): The tenant of the user.
+        hrid (str): The HRID of the instance.
+        max_workers (int): The number of lookups sent in parallel.
+            Defaults to MAX_WORKERS.
+
+    Returns:
+        list[list[str]]: A list of lists of item IDs, in the same order as
+        get_records returns them, or an empty list if no records were found.
+    """
     token = auth(url, username, password, tenant)
-    print('')  # Added print statement after auth
     instance_ids = get_instances(token, url, hrid, tenant)
-    print('')  # Added print statement after get_instances
     if not instance_ids:
         return []
-    item_ids = []
-    for instance_id in instance_ids:
-        holding_ids = get_holdings(token, url, instance_id, tenant)
-        print('')  # Added print statement after get_holdings
-        if holding_ids:
-            for holding_id in holding_ids:
-                items = get_items(token, url, holding_id, tenant)
-                print('')  # Added print statement after get_items
-                if items is not None:
-                    # Changed from extend to append to create a list of lists
-                    item_ids.append(items)
-    return item_ids
+
+    def holdings_of(instance_id):
+        return get_holdings(token, url, instance_id, tenant) or []
+
+    def items_of(holding_id):
+        return get_items(token, url, holding_id, tenant)
+
+    with ThreadPoolExecutor(max_workers=max_workers or MAX_WORKERS) as executor:
+        # executor.map returns the results in the order of its input
+        holdings = executor.map(holdings_of, instance_ids)
+        holding_ids = [h for holding_ids in holdings for h in holding_ids]
+        return list(executor.map(items_of, holding_ids))
+
+
+def get_records_batch(url, username, password, tenant, hrids):
+    """Gets the lists of item IDs for several HRIDs at once.
+    Authenticates the user once, then looks up the instances for all HRIDs,
+    the holdings for all instances and the items for all holdings with
+    batched queries. HRIDs that match no instance cost nothing beyond
+    their share of the instance query.
+
+    Args:
+        url (str): The base URL of the API.
+        username (str): The username of the user.
+        password (str): The password of the user.
+        tenant (str): The tenant of the user.
+        hrids (list[str]): The HRIDs of the instances.
+
+    Returns:
+        dict[str, list[list[str]]]: Lists of item IDs keyed by HRID, in the
+        order of hrids, with the same shape get_records returns for each.
+    """
+    hrids = list(dict.fromkeys(hrids))
+    token = auth(url, username, password, tenant)
+    instances = get_instances_batch(token, url, hrids, tenant)
+    # HRIDs without an instance are answered here, without further lookups
+    records = {hrid: [] for hrid in hrids}
+    instance_ids = [i for hrid in hrids for i in instances[hrid]]
+    if not instance_ids:
+        return records
+    holdings = get_holdings_batch(token, url, instance_ids, tenant)
+    holding_ids = [h for instance_id in instance_ids for h in holdings[instance_id]]
+    if not holding_ids:
+        return records
+    items = get_items_batch(token, url, holding_ids, tenant)
+    for hrid in hrids:
+        records[hrid] = [
+            items[holding_id]
+            for instance_id in instances[hrid]
+            for holding_id in holdings[instance_id]
+        ]
+    return records
+
+
+async def get_records_batch_async(url, username, password, tenant, hrids):
+    """Awaitable version of get_records_batch.
+
+    Args:
+        url (str): The base URL of the API.
+        username (str): The username of the user.
+        password (str): The password of the user.
+        tenant (str): The tenant of the user.
+        hrids (list[str]): The HRIDs of the instances.
+
+    Returns:
+        dict[str, list[list[str]]]: Lists of item IDs keyed by HRID.
+    """
+    return await _run_limited(get_records_batch, url, username, password, tenant, hrids)
 
 
 def main():
-    """Main entry point for the script."""
+    """Main entry point for the script.
+    Any number of HRIDs can be given, on the command line or in a file.
+    They are all looked up together with get_records_batch, so the login
+    and the queries to FOLIO are shared between them. The item IDs for each
+    HRID are printed on stdout as a line of JSON, and the curl commands on
+    stderr.
+    """
     # Create an argument parser
     parser = argparse.ArgumentParser(description='Get records from FOLIO using curl.')
-    # Add arguments for FOLIO URL, username, password, tenant ID and hrid
+    # Add arguments for FOLIO URL, username, password, tenant ID and hrids
     parser.add_argument('url', help='FOLIO URL')
     parser.add_argument('username', help='FOLIO username')
     parser.add_argument('password', help='FOLIO password')
     parser.add_argument('tenant', help='FOLIO tenant ID')
-    parser.add_argument('hrid', help='Human-readable ID of the record to fetch')
+    parser.add_argument(
+        'hrids',
+        nargs='*',
+        metavar='hrid',
+        help='Human-readable ID of a record to fetch',
+    )
+    parser.add_argument(
+        '--hrid-file',
+        type=argparse.FileType('r'),
+        help='File with the human-readable IDs of records to fetch, one per line',
+    )
     # Parse the arguments
     args = parser.parse_args()
-    # Call the get_records function with the arguments
-    get_records(args.url, args.username, args.password, args.tenant, args.hrid)
+    hrids = list(args.hrids)
+    if args.hrid_file:
+        hrids.extend(line.strip() for line in args.hrid_file if line.strip())
+        if args.hrid_file is not sys.stdin:
+            args.hrid_file.close()
+    if not hrids:
+        parser.error('at least one hrid or --hrid-file is required')
+    # Print the curl commands and errors on stderr, separated by blank
+    # lines, so that stdout only has the lines of JSON
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(logging.Formatter('%(message)s\n'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.DEBUG)
+    # Look up all hrids together, so they share one login and batched
+    # queries
+    records = get_records_batch(
+        args.url, args.username, args.password, args.tenant, hrids
+    )
+    for hrid, item_ids in records.items():
+        print(json.dumps({'hrid': hrid, 'items': item_ids}))
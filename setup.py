@@ -5,8 +5,10 @@ setup(
     version='0.1.0',
     description='A command-line tool that wraps curl and adds some convenience features for working with FOLIO APIs',
     py_modules=['folio_curl'],
+    python_requires='>=3.9',
     install_requires=[
         'requests',
     ],
+    extras_require={'orjson': ['orjson'], 'test': ['urllib3>=2']},
     entry_points={'console_scripts': ['folio_curl=folio_curl:main']},
 )
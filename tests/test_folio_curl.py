@@ -1,7 +1,283 @@
+import asyncio
+import http.client
+import io
+import json
+import logging
+import sys
+import threading
+import time
 import unittest
+import uuid
+from datetime import datetime, timedelta, timezone
 from unittest.mock import patch
 
-from folio_curl import auth, get_holdings, get_instances, get_items, get_records, main
+import requests
+import urllib3
+from urllib3 import HTTPResponse
+
+import folio_curl
+
+from folio_curl import (
+    ItemRef,
+    ItemsLoader,
+    BATCH_SIZE,
+    PAGE_SIZE,
+    auth,
+    auth_async,
+    get_holdings,
+    get_holdings_async,
+    get_holdings_batch,
+    get_instances,
+    get_instances_batch,
+    get_item_refs,
+    get_items,
+    get_items_async,
+    get_items_batch,
+    get_records,
+    get_records_async,
+    get_records_batch,
+    get_records_threaded,
+    iter_holdings,
+    main,
+)
+
+
+def mock_json_response(payload):
+    """Creates a mock response object whose body is the given JSON payload."""
+    mock_response = unittest.mock.Mock()
+    mock_response.content = json.dumps(payload).encode()
+    mock_response.json.return_value = payload
+    return mock_response
+
+
+def fake_response(status=200, payload=None, headers=None):
+    """Creates a raw urllib3 response as FOLIO would send it.
+    The payload is sent as JSON, unless it is already bytes.
+    """
+    if payload is None:
+        body = b''
+    elif isinstance(payload, bytes):
+        body = payload
+    else:
+        body = json.dumps(payload).encode()
+    raw_headers = ''.join(
+        f'{name}: {value}\r\n' for name, value in (headers or {}).items()
+    )
+    # requests reads cookies from the headers of the http.client response
+    original_response = unittest.mock.Mock()
+    original_response.msg = http.client.parse_headers(
+        io.BytesIO(f'{raw_headers}\r\n'.encode())
+    )
+    return HTTPResponse(
+        body=io.BytesIO(body),
+        status=status,
+        headers=headers or {},
+        preload_content=False,
+        original_response=original_response,
+    )
+
+
+class FakeTransport:
+    """Replaces the network below the shared session's connection pools.
+    Requests go through the real session, adapter, retries and pools, and
+    only the exchange on the connection is faked: each request is
+    recorded and answered with the next of the given responses. This
+    relies on the internals of urllib3 2, so tests using it are skipped
+    with older versions.
+    """
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        # The (method, url, headers, body) of each request sent
+        self.requests = []
+        # The pooled connection each request was sent on
+        self.connections = []
+        self._patcher = patch(
+            'urllib3.connectionpool.HTTPConnectionPool._make_request',
+            autospec=True,
+            side_effect=self._respond,
+        )
+
+    def _respond(self, pool, conn, method, url, body=None, headers=None, **kwargs):
+        self.requests.append(
+            (method, f'{pool.scheme}://{pool.host}{url}', dict(headers), body)
+        )
+        self.connections.append(conn)
+        response = self.responses.pop(0)
+        # Like a real response, hand the connection back to the pool once
+        # the body has been read
+        response._connection = kwargs.get('response_conn')
+        response._pool = pool
+        return response
+
+    def __enter__(self):
+        if int(urllib3.__version__.split('.')[0]) < 2:
+            raise unittest.SkipTest('FakeTransport needs urllib3 2')
+        self._patcher.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._patcher.stop()
+
+
+class FakeClock:
+    """A clock for time.monotonic whose time.sleep returns immediately."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class TestSession(unittest.TestCase):
+    def test_adapter(self):
+        # Both schemes share one pooled, retrying adapter
+        adapter = folio_curl._SESSION.get_adapter('https://folio.example.com')
+        self.assertIs(adapter, folio_curl._SESSION.get_adapter('http://localhost'))
+        self.assertGreaterEqual(adapter._pool_maxsize, folio_curl.MAX_WORKERS)
+        self.assertTrue(adapter._pool_block)
+        self.assertIn(503, adapter.max_retries.status_forcelist)
+        self.assertIn(429, adapter.max_retries.status_forcelist)
+        self.assertIn('POST', adapter.max_retries.allowed_methods)
+        self.assertTrue(adapter.max_retries.respect_retry_after_header)
+
+    @patch('urllib3.util.retry.time.sleep')
+    def test_adapter_retries(self, mock_sleep):
+        # The session retries a rate limited request after the time given
+        # in Retry-After and returns the response that follows
+        with FakeTransport(
+            fake_response(429, headers={'Retry-After': '2'}),
+            fake_response(200, {'instances': [{'id': 'instance-id'}]}),
+        ) as transport:
+            instance_ids = get_instances(
+                "valid-token", "http://folio.example.com", "1234567890", "testtenant"
+            )
+        self.assertEqual(instance_ids, ["instance-id"])
+        self.assertEqual(len(transport.requests), 2)
+        mock_sleep.assert_called_once_with(2.0)
+
+    @patch('urllib3.util.retry.time.sleep')
+    def test_adapter_retries_exhausted(self, mock_sleep):
+        # The last error response is handled by the lookup once the
+        # retries run out, instead of raising
+        get_holdings.cache_clear()
+        with FakeTransport(
+            *[fake_response(503, b'Service Unavailable') for _ in range(6)]
+        ) as transport:
+            with self.assertLogs('folio_curl', level='ERROR'):
+                id_list = get_holdings(
+                    "valid-token",
+                    "https://folio.example.com",
+                    "instance-id",
+                    "testtenant",
+                )
+        self.assertIsNone(id_list)
+        self.assertEqual(len(transport.requests), 6)
+
+    def test_connection_reuse(self):
+        # Consecutive lookups are sent on the same pooled connection
+        with FakeTransport(
+            fake_response(200, {'instances': [{'id': 'instance-id'}]}),
+            fake_response(200, {'instances': []}),
+        ) as transport:
+            get_instances("valid-token", "https://folio.example.com", "1", "testtenant")
+            get_instances("valid-token", "https://folio.example.com", "2", "testtenant")
+        self.assertIs(transport.connections[0], transport.connections[1])
+
+    @patch('requests.sessions.get_environ_proxies', return_value={})
+    def test_environment_settings(self, mock_get_environ_proxies):
+        # The environment is read once per host, not for every request
+        with patch.object(folio_curl._SESSION, '_environment_settings', {}):
+            with FakeTransport(
+                fake_response(200, {'instances': []}),
+                fake_response(200, {'instances': []}),
+                fake_response(200, {'instances': []}),
+            ) as transport:
+                for url in [
+                    "https://folio.example.com",
+                    "https://folio.example.com",
+                    "https://other.example.com",
+                ]:
+                    get_instances("valid-token", url, "1234567890", "testtenant")
+        self.assertEqual(len(transport.requests), 3)
+        self.assertEqual(mock_get_environ_proxies.call_count, 2)
+
+    def test_rate_limit_pause(self):
+        # Once FOLIO says no requests are left, the next one waits for as
+        # long as Retry-After asks
+        adapter = folio_curl._SESSION.get_adapter('https://folio.example.com')
+        clock = FakeClock()
+        with patch('folio_curl.time', clock), patch.object(
+            adapter, 'rate_limiter', folio_curl._TokenBucket()
+        ), FakeTransport(
+            fake_response(
+                200,
+                {'instances': []},
+                {'X-RateLimit-Remaining': '0', 'Retry-After': '0.5'},
+            ),
+            fake_response(200, {'instances': []}),
+        ):
+            get_instances("valid-token", "https://folio.example.com", "1", "testtenant")
+            self.assertEqual(clock.sleeps, [])
+            get_instances("valid-token", "https://folio.example.com", "2", "testtenant")
+            self.assertEqual(clock.sleeps, [0.5])
+
+    @patch('folio_curl.RATE_LIMIT', 2)
+    def test_rate_limit(self):
+        clock = FakeClock()
+        with patch('folio_curl.time', clock):
+            bucket = folio_curl._TokenBucket()
+            for _ in range(4):
+                bucket.acquire()
+        # A burst of up to RATE_LIMIT requests, then one every 1 / RATE_LIMIT
+        self.assertEqual(clock.sleeps, [0.5, 0.5])
+
+    @patch('requests.adapters.HTTPAdapter.send')
+    def test_adapter_timeout(self, mock_send):
+        adapter = folio_curl._SESSION.get_adapter('https://folio.example.com')
+        adapter.send('request')
+        mock_send.assert_called_once_with('request', timeout=folio_curl.TIMEOUT)
+        adapter.send('request', timeout=1)
+        self.assertEqual(mock_send.call_args.kwargs['timeout'], 1)
+
+
+class TestAuthHeaders(unittest.TestCase):
+    def test_auth_headers(self):
+        headers = folio_curl._auth_headers('valid-token', 'testtenant')
+        self.assertEqual(
+            headers,
+            {
+                'Accept': 'application/json',
+                'Content-Type': 'application/json',
+                'X-Okapi-Tenant': 'testtenant',
+                'X-Okapi-Token': 'valid-token',
+            },
+        )
+        # The headers are reused for the same token and tenant
+        self.assertIs(folio_curl._auth_headers('valid-token', 'testtenant'), headers)
+        with self.assertRaises(TypeError):
+            headers['X-Okapi-Token'] = 'other-token'
+
+
+class TestLoads(unittest.TestCase):
+    def test_loads(self):
+        response = mock_json_response({'items': [{'id': 'item-id-1'}]})
+        self.assertEqual(folio_curl._loads(response), {'items': [{'id': 'item-id-1'}]})
+        response.json.assert_not_called()
+
+    @patch('folio_curl.orjson', None)
+    def test_loads_without_orjson(self):
+        response = mock_json_response({'items': []})
+        self.assertEqual(folio_curl._loads(response), {'items': []})
+        response.content = b'Token missing'
+        with self.assertRaises(json.JSONDecodeError):
+            folio_curl._loads(response)
 
 
 class TestAuth(unittest.TestCase):
@@ -11,14 +287,16 @@ class TestAuth(unittest.TestCase):
         self.username = "testuser"
         self.password = "testpass"
         self.tenant = "testtenant"
+        # Start every test without cached tokens
+        auth.cache_clear()
 
-    @patch('requests.post')
+    @patch('folio_curl._SESSION.post')
     def test_valid_credentials(self, mock_post):
         # Arrange
         # Use the variables from setUp
-        # Create a mock response object with a valid token header
-        mock_response = unittest.mock.Mock()
-        mock_response.headers = {'x-okapi-token': 'valid-token'}
+        # Create a mock response object with a valid token cookie
+        mock_response = mock_json_response({})
+        mock_response.cookies = {'folioAccessToken': 'valid-token'}
         # Make the mock post function return the mock response object
         mock_post.return_value = mock_response
         # Act
@@ -29,7 +307,7 @@ class TestAuth(unittest.TestCase):
         self.assertEqual(token, 'valid-token')
         # Verify that the mock post function was called with the correct arguments
         mock_post.assert_called_once_with(
-            f'{self.url}/authn/login',
+            f'{self.url}/authn/login-with-expiry',
             headers={
                 'Accept': 'application/json',
                 'Content-Type': 'application/json',
@@ -38,14 +316,52 @@ class TestAuth(unittest.TestCase):
             json={'username': self.username, 'password': self.password},
         )
 
-    @patch('requests.post')
+    def test_login_request(self):
+        # The login goes through the session and the token is read from
+        # the cookie FOLIO sets
+        with FakeTransport(
+            fake_response(
+                201,
+                {'accessTokenExpiration': '2030-01-01T00:00:00Z'},
+                {'Set-Cookie': 'folioAccessToken=valid-token; Path=/; Secure'},
+            )
+        ) as transport:
+            token = auth(self.url, self.username, self.password, self.tenant)
+        self.assertEqual(token, 'valid-token')
+        ((method, url, headers, body),) = transport.requests
+        self.assertEqual(method, 'POST')
+        self.assertEqual(url, f'{self.url}/authn/login-with-expiry')
+        self.assertEqual(headers['X-Okapi-Tenant'], self.tenant)
+        self.assertEqual(
+            json.loads(body), {'username': self.username, 'password': self.password}
+        )
+
+    def test_login_cookie_not_kept(self):
+        # The token of one user is not sent with the requests of another
+        with FakeTransport(
+            fake_response(
+                201,
+                {'accessTokenExpiration': '2030-01-01T00:00:00Z'},
+                {'Set-Cookie': 'folioAccessToken=user-a-token; Path=/; Secure'},
+            ),
+            fake_response(200, {'instances': []}),
+        ) as transport:
+            token = auth(self.url, 'user-a', self.password, self.tenant)
+            get_instances('user-b-token', self.url, '1234567890', 'tenant-b')
+        self.assertEqual(token, 'user-a-token')
+        headers = transport.requests[1][2]
+        self.assertNotIn('Cookie', headers)
+        self.assertEqual(headers['X-Okapi-Token'], 'user-b-token')
+        self.assertEqual(len(folio_curl._SESSION.cookies), 0)
+
+    @patch('folio_curl._SESSION.post')
     def test_invalid_credentials(self, mock_post):
         # Arrange
         # Use the variables from setUp but change the password to an invalid one
         invalid_password = "wrongpass"
-        # Create a mock response object with no token header
+        # Create a mock response object with no token cookie
         mock_response = unittest.mock.Mock()
-        mock_response.headers = {}
+        mock_response.cookies = {}
         # Make the mock post function return the mock response object
         mock_post.return_value = mock_response
         # Act
@@ -54,7 +370,7 @@ class TestAuth(unittest.TestCase):
         self.assertIsNone(token)
         # Verify that the mock post function was called with the correct arguments
         mock_post.assert_called_once_with(
-            f'{self.url}/authn/login',
+            f'{self.url}/authn/login-with-expiry',
             headers={
                 'Accept': 'application/json',
                 'Content-Type': 'application/json',
@@ -63,6 +379,105 @@ class TestAuth(unittest.TestCase):
             json={'username': self.username, 'password': invalid_password},
         )
 
+    @patch('folio_curl._SESSION.post')
+    def test_cached_token(self, mock_post):
+        mock_response = mock_json_response({})
+        mock_response.cookies = {'folioAccessToken': 'valid-token'}
+        mock_post.return_value = mock_response
+        token_1 = auth(self.url, self.username, self.password, self.tenant)
+        token_2 = auth(self.url, self.username, self.password, self.tenant)
+        self.assertEqual(token_1, 'valid-token')
+        self.assertEqual(token_2, 'valid-token')
+        # The second call is served from the cache
+        mock_post.assert_called_once()
+
+    @patch('folio_curl._SESSION.post')
+    def test_cached_token_other_password(self, mock_post):
+        mock_response = mock_json_response({})
+        mock_response.cookies = {'folioAccessToken': 'valid-token'}
+        mock_post.return_value = mock_response
+        auth(self.url, self.username, self.password, self.tenant)
+        # A cached token is only returned for the password it was issued for
+        mock_post.return_value = unittest.mock.Mock(cookies={})
+        token = auth(self.url, self.username, "wrongpass", self.tenant)
+        self.assertIsNone(token)
+        self.assertEqual(mock_post.call_count, 2)
+
+    @patch('folio_curl.time.monotonic')
+    @patch('folio_curl._SESSION.post')
+    def test_cached_token_expired(self, mock_post, mock_monotonic):
+        mock_response = mock_json_response({})
+        mock_response.cookies = {'folioAccessToken': 'valid-token'}
+        mock_post.return_value = mock_response
+        mock_monotonic.return_value = 1000.0
+        auth(self.url, self.username, self.password, self.tenant)
+        # Once the token is older than TOKEN_TTL the user logs in again
+        mock_monotonic.return_value = 1000.0 + folio_curl.TOKEN_TTL
+        auth(self.url, self.username, self.password, self.tenant)
+        self.assertEqual(mock_post.call_count, 2)
+
+    @patch('folio_curl.time.monotonic')
+    @patch('folio_curl._SESSION.post')
+    def test_cached_token_until_expiration(self, mock_post, mock_monotonic):
+        # The token expires a minute after the login, before TOKEN_TTL
+        expiration = datetime.now(timezone.utc) + timedelta(seconds=60)
+        mock_response = mock_json_response(
+            {'accessTokenExpiration': expiration.isoformat().replace('+00:00', 'Z')}
+        )
+        mock_response.cookies = {'folioAccessToken': 'valid-token'}
+        mock_post.return_value = mock_response
+        mock_monotonic.return_value = 1000.0
+        auth(self.url, self.username, self.password, self.tenant)
+        mock_monotonic.return_value = 1030.0
+        auth(self.url, self.username, self.password, self.tenant)
+        self.assertEqual(mock_post.call_count, 1)
+        mock_monotonic.return_value = 1060.0
+        auth(self.url, self.username, self.password, self.tenant)
+        self.assertEqual(mock_post.call_count, 2)
+
+    @patch('folio_curl._SESSION.get')
+    @patch('folio_curl._SESSION.post')
+    def test_rejected_token_dropped(self, mock_post, mock_get):
+        mock_response = mock_json_response({})
+        mock_response.cookies = {'folioAccessToken': 'revoked-token'}
+        mock_post.return_value = mock_response
+        token = auth(self.url, self.username, self.password, self.tenant)
+        mock_get.return_value = mock_json_response({})
+        mock_get.return_value.status_code = 401
+        get_holdings(token, self.url, 'instance-id-1', self.tenant)
+        # The next call logs in again instead of returning the revoked token
+        auth(self.url, self.username, self.password, self.tenant)
+        self.assertEqual(mock_post.call_count, 2)
+
+    @patch.object(auth.cache, 'ttl', 10)
+    @patch('folio_curl.time.monotonic')
+    @patch('folio_curl._SESSION.post')
+    def test_cache_ttl_changed(self, mock_post, mock_monotonic):
+        mock_response = mock_json_response({})
+        mock_response.cookies = {'folioAccessToken': 'valid-token'}
+        mock_post.return_value = mock_response
+        mock_monotonic.return_value = 1000.0
+        auth(self.url, self.username, self.password, self.tenant)
+        # The ttl set on the cache applies instead of TOKEN_TTL
+        mock_monotonic.return_value = 1010.0
+        auth(self.url, self.username, self.password, self.tenant)
+        self.assertEqual(mock_post.call_count, 2)
+
+    @patch.object(auth.cache, 'maxsize', 2)
+    @patch('folio_curl._SESSION.post')
+    def test_cache_size(self, mock_post):
+        mock_response = mock_json_response({})
+        mock_response.cookies = {'folioAccessToken': 'valid-token'}
+        mock_post.return_value = mock_response
+        for tenant in ['tenant-1', 'tenant-2', 'tenant-1', 'tenant-3']:
+            auth(self.url, self.username, self.password, tenant)
+        self.assertEqual(mock_post.call_count, 3)
+        # tenant-2 was the least recently used token and was dropped
+        auth(self.url, self.username, self.password, 'tenant-1')
+        self.assertEqual(mock_post.call_count, 3)
+        auth(self.url, self.username, self.password, 'tenant-2')
+        self.assertEqual(mock_post.call_count, 4)
+
 
 class TestGetInstances(unittest.TestCase):
     def setUp(self):
@@ -72,15 +487,14 @@ class TestGetInstances(unittest.TestCase):
         self.hrid = "1234567890"
         self.tenant = "testtenant"
 
-    @patch('requests.get')
+    @patch('folio_curl._SESSION.get')
     def test_valid_hrid(self, mock_get):
         # Arrange
         # Use the variables from setUp
         # Create a mock response object with a valid instance ID
-        mock_response = unittest.mock.Mock()
-        mock_response.json.return_value = {
-            'instances': [{'id': 'instance-id-1'}, {'id': 'instance-id-2'}]
-        }
+        mock_response = mock_json_response(
+            {'instances': [{'id': 'instance-id-1'}, {'id': 'instance-id-2'}]}
+        )
         # Make the mock get function return the mock response object
         mock_get.return_value = mock_response
         # Act
@@ -98,17 +512,19 @@ class TestGetInstances(unittest.TestCase):
                 'X-Okapi-Tenant': self.tenant,
                 'X-Okapi-Token': self.token,
             },
-            params={'query': f'(hrid=="{self.hrid}" NOT discoverySuppress==true)'},
+            params={
+                'query': f'(hrid=="{self.hrid}" NOT discoverySuppress==true)',
+                'limit': PAGE_SIZE,
+            },
         )
 
-    @patch('requests.get')
+    @patch('folio_curl._SESSION.get')
     def test_invalid_hrid(self, mock_get):
         # Arrange
         # Use the variables from setUp but change the hrid to an invalid one
         invalid_hrid = "9999999999"
         # Create a mock response object with an empty instance list
-        mock_response = unittest.mock.Mock()
-        mock_response.json.return_value = {'instances': []}
+        mock_response = mock_json_response({'instances': []})
         # Make the mock get function return the mock response object
         mock_get.return_value = mock_response
         # Act
@@ -124,9 +540,57 @@ class TestGetInstances(unittest.TestCase):
                 'X-Okapi-Tenant': self.tenant,
                 'X-Okapi-Token': self.token,
             },
-            params={'query': f'(hrid=="{invalid_hrid}" NOT discoverySuppress==true)'},
+            params={
+                'query': f'(hrid=="{invalid_hrid}" NOT discoverySuppress==true)',
+                'limit': PAGE_SIZE,
+            },
+        )
+
+    @patch('folio_curl._SESSION.get')
+    def test_hrid_is_escaped(self, mock_get):
+        mock_get.return_value = mock_json_response({'instances': []})
+        get_instances(self.token, self.url, 'in"12\\3*', self.tenant)
+        # Quotes, backslashes and wildcards are matched literally
+        self.assertEqual(
+            mock_get.call_args.kwargs['params']['query'],
+            '(hrid=="in\\"12\\\\3\\*" NOT discoverySuppress==true)',
         )
 
+    @patch('folio_curl._SESSION.get')
+    def test_integer_hrid(self, mock_get):
+        mock_get.return_value = mock_json_response({'instances': []})
+        get_instances(self.token, self.url, 123, self.tenant)
+        self.assertEqual(
+            mock_get.call_args.kwargs['params']['query'],
+            '(hrid=="123" NOT discoverySuppress==true)',
+        )
+
+    @patch('folio_curl._SESSION.get')
+    def test_curl_command_logged(self, mock_get):
+        mock_response = mock_json_response({'instances': []})
+        # The URL of the request as it was sent, with the encoded query string
+        mock_response.request.url = (
+            f'{self.url}/instance-storage/instances?query=%28hrid%3D%3D%22'
+            f'{self.hrid}%22+NOT+discoverySuppress%3D%3Dtrue%29&limit={PAGE_SIZE}'
+        )
+        mock_get.return_value = mock_response
+        with self.assertLogs('folio_curl', level='DEBUG') as logs:
+            get_instances(self.token, self.url, self.hrid, self.tenant)
+        self.assertEqual(len(logs.records), 1)
+        curl_string = logs.records[0].getMessage()
+        self.assertTrue(curl_string.startswith('curl '))
+        # The curl command requests exactly the URL that was sent
+        self.assertTrue(curl_string.endswith(f"'{mock_response.request.url}'"))
+
+    @patch('folio_curl.shlex.quote')
+    @patch('folio_curl._SESSION.get')
+    def test_curl_command_skipped(self, mock_get, mock_quote):
+        mock_get.return_value = mock_json_response({'instances': []})
+        # The curl command is not built unless debug logging is enabled
+        with patch.object(folio_curl.logger, 'isEnabledFor', return_value=False):
+            get_instances(self.token, self.url, self.hrid, self.tenant)
+        mock_quote.assert_not_called()
+
 
 class TestGetHoldings(unittest.TestCase):
     def setUp(self):
@@ -135,16 +599,16 @@ class TestGetHoldings(unittest.TestCase):
         self.url = "https://folio.example.com"
         self.instance_id = "instance-id"
         self.tenant = "testtenant"
+        get_holdings.cache_clear()
 
-    @patch('requests.get')
+    @patch('folio_curl._SESSION.get')
     def test_valid_instance_id(self, mock_get):
         # Arrange
         # Use the variables from setUp
         # Create a mock response object with a list of holding IDs
-        mock_response = unittest.mock.Mock()
-        mock_response.json.return_value = {
-            'holdingsRecords': [{'id': 'holding-id-1'}, {'id': 'holding-id-2'}]
-        }
+        mock_response = mock_json_response(
+            {'holdingsRecords': [{'id': 'holding-id-1'}, {'id': 'holding-id-2'}]}
+        )
         # Make the mock get function return the mock response object
         mock_get.return_value = mock_response
         # Act
@@ -163,18 +627,19 @@ class TestGetHoldings(unittest.TestCase):
                 'X-Okapi-Token': self.token,
             },
             params={
-                'query': f'(instanceId=="{self.instance_id}" NOT discoverySuppress==true)'
+                'query': f'(instanceId=="{self.instance_id}" NOT discoverySuppress==true) sortBy id',
+                'limit': PAGE_SIZE,
+                'offset': 0,
             },
         )
 
-    @patch('requests.get')
+    @patch('folio_curl._SESSION.get')
     def test_invalid_instance_id(self, mock_get):
         # Arrange
         # Use the variables from setUp but change the instance_id to an invalid one
         invalid_instance_id = "invalid-id"
         # Create a mock response object with an empty holdings list
-        mock_response = unittest.mock.Mock()
-        mock_response.json.return_value = {'holdingsRecords': []}
+        mock_response = mock_json_response({'holdingsRecords': []})
         # Make the mock get function return the mock response object
         mock_get.return_value = mock_response
         # Act
@@ -192,10 +657,118 @@ class TestGetHoldings(unittest.TestCase):
                 'X-Okapi-Token': self.token,
             },
             params={
-                'query': f'(instanceId=="{invalid_instance_id}" NOT discoverySuppress==true)'
+                'query': f'(instanceId=="{invalid_instance_id}" NOT discoverySuppress==true) sortBy id',
+                'limit': PAGE_SIZE,
+                'offset': 0,
             },
         )
 
+    @patch('folio_curl._SESSION.get')
+    def test_invalid_json(self, mock_get):
+        mock_response = unittest.mock.Mock()
+        mock_response.content = b'Token missing'
+        mock_response.json.side_effect = json.JSONDecodeError('Expecting value', '', 0)
+        mock_get.return_value = mock_response
+        with self.assertLogs('folio_curl', level='ERROR') as logs:
+            id_list = get_holdings(self.token, self.url, self.instance_id, self.tenant)
+        self.assertIsNone(id_list)
+        self.assertIn('Failed to parse response as JSON', logs.output[0])
+
+    @patch('folio_curl._SESSION.get')
+    def test_missing_holdings_list(self, mock_get):
+        # A response without a holdingsRecords list, e.g. an error body
+        mock_get.return_value = mock_json_response({'errors': []})
+        id_list = get_holdings(self.token, self.url, self.instance_id, self.tenant)
+        self.assertEqual(id_list, [])
+
+    def test_request(self):
+        # The lookup goes through the session with the query in the URL
+        with FakeTransport(
+            fake_response(200, {'holdingsRecords': [{'id': 'holding-id-1'}]})
+        ) as transport:
+            id_list = get_holdings(self.token, self.url, self.instance_id, self.tenant)
+        self.assertEqual(id_list, ['holding-id-1'])
+        ((method, url, headers, body),) = transport.requests
+        self.assertEqual(method, 'GET')
+        self.assertEqual(
+            url,
+            f'{self.url}/holdings-storage/holdings'
+            '?query=%28instanceId%3D%3D%22instance-id%22+NOT+discoverySuppress%3D%3Dtrue%29+sortBy+id'
+            f'&limit={PAGE_SIZE}&offset=0',
+        )
+        self.assertEqual(headers['X-Okapi-Tenant'], self.tenant)
+        self.assertEqual(headers['X-Okapi-Token'], self.token)
+        self.assertIsNone(body)
+
+    @patch('folio_curl._SESSION.get')
+    def test_paging(self, mock_get):
+        # A full page is followed by a short one, which ends the paging
+        first_page = [{'id': f'holding-id-{i}'} for i in range(PAGE_SIZE)]
+        mock_get.side_effect = [
+            mock_json_response({'holdingsRecords': first_page}),
+            mock_json_response({'holdingsRecords': [{'id': 'holding-id-last'}]}),
+        ]
+        id_list = get_holdings(self.token, self.url, self.instance_id, self.tenant)
+        self.assertEqual(len(id_list), PAGE_SIZE + 1)
+        self.assertEqual(id_list[-1], 'holding-id-last')
+        offsets = [call.kwargs['params']['offset'] for call in mock_get.call_args_list]
+        self.assertEqual(offsets, [0, PAGE_SIZE])
+        # Every page is read in the same order
+        for call in mock_get.call_args_list:
+            self.assertTrue(call.kwargs['params']['query'].endswith(' sortBy id'))
+
+    @patch('folio_curl._SESSION.get')
+    def test_iter_holdings_is_lazy(self, mock_get):
+        mock_get.return_value = mock_json_response(
+            {'holdingsRecords': [{'id': 'holding-id-1'}]}
+        )
+        holding_ids = iter_holdings(self.token, self.url, self.instance_id, self.tenant)
+        mock_get.assert_not_called()
+        self.assertEqual(next(holding_ids), 'holding-id-1')
+        mock_get.assert_called_once()
+
+    @patch('folio_curl._SESSION.get')
+    def test_cached_result(self, mock_get):
+        mock_get.return_value = mock_json_response(
+            {'holdingsRecords': [{'id': 'holding-id-1'}]}
+        )
+        id_list = get_holdings(self.token, self.url, self.instance_id, self.tenant)
+        id_list.append('holding-id-2')
+        # Another token for the same tenant reuses the result
+        id_list = get_holdings('other-token', self.url, self.instance_id, self.tenant)
+        self.assertEqual(id_list, ['holding-id-1'])
+        self.assertEqual(mock_get.call_count, 1)
+        get_holdings(self.token, self.url, self.instance_id, 'othertenant')
+        self.assertEqual(mock_get.call_count, 2)
+
+    @patch('folio_curl._SESSION.get')
+    def test_keyword_arguments(self, mock_get):
+        mock_get.return_value = mock_json_response(
+            {'holdingsRecords': [{'id': 'holding-id-1'}]}
+        )
+        id_list = get_holdings(
+            token=self.token,
+            url=self.url,
+            instance_id=self.instance_id,
+            tenant=self.tenant,
+        )
+        self.assertEqual(id_list, ['holding-id-1'])
+        # The cache is shared with positional calls
+        get_holdings(self.token, self.url, self.instance_id, tenant=self.tenant)
+        self.assertEqual(mock_get.call_count, 1)
+
+    @patch('folio_curl.time.monotonic')
+    @patch('folio_curl._SESSION.get')
+    def test_cached_result_expired(self, mock_get, mock_monotonic):
+        mock_get.return_value = mock_json_response(
+            {'holdingsRecords': [{'id': 'holding-id-1'}]}
+        )
+        mock_monotonic.return_value = 1000.0
+        get_holdings(self.token, self.url, self.instance_id, self.tenant)
+        mock_monotonic.return_value = 1000.0 + folio_curl.LOOKUP_TTL
+        get_holdings(self.token, self.url, self.instance_id, self.tenant)
+        self.assertEqual(mock_get.call_count, 2)
+
 
 class TestGetItems(unittest.TestCase):
     def setUp(self):
@@ -204,16 +777,27 @@ class TestGetItems(unittest.TestCase):
         self.url = "https://folio.example.com"
         self.holding_id = "holding-id"
         self.tenant = "testtenant"
+        get_items.cache_clear()
 
-    @patch('requests.get')
+    @patch('folio_curl._SESSION.get')
+    def test_keyword_arguments(self, mock_get):
+        mock_get.return_value = mock_json_response({'items': [{'id': 'item-id-1'}]})
+        id_list = get_items(
+            token=self.token,
+            url=self.url,
+            holding_id=self.holding_id,
+            tenant=self.tenant,
+        )
+        self.assertEqual(id_list, ['item-id-1'])
+
+    @patch('folio_curl._SESSION.get')
     def test_valid_holding_id(self, mock_get):
         # Arrange
         # Use the variables from setUp
         # Create a mock response object with a list of item IDs
-        mock_response = unittest.mock.Mock()
-        mock_response.json.return_value = {
-            'items': [{'id': 'item-id-1'}, {'id': 'item-id-2'}]
-        }
+        mock_response = mock_json_response(
+            {'items': [{'id': 'item-id-1'}, {'id': 'item-id-2'}]}
+        )
         # Make the mock get function return the mock response object
         mock_get.return_value = mock_response
         # Act
@@ -232,18 +816,19 @@ class TestGetItems(unittest.TestCase):
                 'X-Okapi-Token': self.token,
             },
             params={
-                'query': f'(holdingsRecordId=="{self.holding_id}" NOT discoverySuppress==true)'
+                'query': f'(holdingsRecordId=="{self.holding_id}" NOT discoverySuppress==true) sortBy id',
+                'limit': PAGE_SIZE,
+                'offset': 0,
             },
         )
 
-    @patch('requests.get')
+    @patch('folio_curl._SESSION.get')
     def test_invalid_holding_id(self, mock_get):
         # Arrange
         # Use the variables from setUp but change the holding_id to an invalid one
         invalid_holding_id = "invalid-id"
         # Create a mock response object with an empty items list
-        mock_response = unittest.mock.Mock()
-        mock_response.json.return_value = {'items': []}
+        mock_response = mock_json_response({'items': []})
         # Make the mock get function return the mock response object
         mock_get.return_value = mock_response
         # Act
@@ -261,7 +846,302 @@ class TestGetItems(unittest.TestCase):
                 'X-Okapi-Token': self.token,
             },
             params={
-                'query': f'(holdingsRecordId=="{invalid_holding_id}" NOT discoverySuppress==true)'
+                'query': f'(holdingsRecordId=="{invalid_holding_id}" NOT discoverySuppress==true) sortBy id',
+                'limit': PAGE_SIZE,
+                'offset': 0,
+            },
+        )
+
+
+class TestGetInstancesBatch(unittest.TestCase):
+    def setUp(self):
+        # Set up some common variables for testing
+        self.token = "valid-token"
+        self.url = "https://folio.example.com"
+        self.tenant = "testtenant"
+
+    @patch('folio_curl._SESSION.get')
+    def test_valid_hrids(self, mock_get):
+        # Arrange
+        # Create a mock response object with instances for two of three HRIDs
+        mock_get.return_value = mock_json_response(
+            {
+                'instances': [
+                    {'id': 'instance-id-1', 'hrid': 'hrid-1'},
+                    {'id': 'instance-id-3', 'hrid': 'hrid-3'},
+                ]
+            }
+        )
+        # Act
+        instances = get_instances_batch(
+            self.token, self.url, ['hrid-1', 'hrid-2', 'hrid-3'], self.tenant
+        )
+        # Assert
+        self.assertEqual(
+            instances,
+            {'hrid-1': ['instance-id-1'], 'hrid-2': [], 'hrid-3': ['instance-id-3']},
+        )
+        # Verify that all HRIDs were looked up with a single request
+        mock_get.assert_called_once_with(
+            f'{self.url}/instance-storage/instances',
+            headers={
+                'Accept': 'application/json',
+                'Content-Type': 'application/json',
+                'X-Okapi-Tenant': self.tenant,
+                'X-Okapi-Token': self.token,
+            },
+            params={
+                'query': '(hrid==("hrid-1" or "hrid-2" or "hrid-3") NOT discoverySuppress==true) sortBy id',
+                'limit': PAGE_SIZE,
+                'offset': 0,
+            },
+        )
+
+    @patch('folio_curl._SESSION.get')
+    def test_hrid_case(self, mock_get):
+        # FOLIO matches HRIDs regardless of case, and returns them as stored
+        mock_get.return_value = mock_json_response(
+            {
+                'instances': [
+                    {'id': 'instance-id-1', 'hrid': 'IN001'},
+                    {'id': 'instance-id-2', 'hrid': 'other'},
+                ]
+            }
+        )
+        with self.assertLogs('folio_curl', level='WARNING') as logs:
+            instances = get_instances_batch(
+                self.token, self.url, ['in001', 'IN001', 'in002'], self.tenant
+            )
+        self.assertEqual(
+            instances,
+            {'in001': ['instance-id-1'], 'IN001': ['instance-id-1'], 'in002': []},
+        )
+        # Records for HRIDs that were not asked for are skipped
+        self.assertIn('instance-id-2', logs.output[0])
+
+
+class TestGetHoldingsBatch(unittest.TestCase):
+    def setUp(self):
+        # Set up some common variables for testing
+        self.token = "valid-token"
+        self.url = "https://folio.example.com"
+        self.tenant = "testtenant"
+        get_holdings.cache_clear()
+        get_items.cache_clear()
+
+    @patch('folio_curl._SESSION.get')
+    def test_uuid_instance_ids(self, mock_get):
+        instance_id = uuid.UUID('5bf370e0-8cca-4d9c-82e4-5170ab2a0a39')
+        mock_get.return_value = mock_json_response(
+            {
+                'holdingsRecords': [
+                    {'id': 'holding-id-1', 'instanceId': str(instance_id)}
+                ]
+            }
+        )
+        holdings = get_holdings_batch(self.token, self.url, [instance_id], self.tenant)
+        self.assertEqual(holdings, {instance_id: ['holding-id-1']})
+        self.assertEqual(
+            mock_get.call_args.kwargs['params']['query'],
+            f'(instanceId==("{instance_id}") NOT discoverySuppress==true) sortBy id',
+        )
+
+    @patch('folio_curl._SESSION.get')
+    def test_cached_instances(self, mock_get):
+        mock_get.return_value = mock_json_response(
+            {'holdingsRecords': [{'id': 'holding-id-1', 'instanceId': 'instance-id-1'}]}
+        )
+        get_holdings_batch(self.token, self.url, ['instance-id-1'], self.tenant)
+        # Only the instance that is not cached yet is queried
+        mock_get.return_value = mock_json_response(
+            {'holdingsRecords': [{'id': 'holding-id-2', 'instanceId': 'instance-id-2'}]}
+        )
+        holdings = get_holdings_batch(
+            self.token, self.url, ['instance-id-1', 'instance-id-2'], self.tenant
+        )
+        self.assertEqual(
+            holdings,
+            {'instance-id-1': ['holding-id-1'], 'instance-id-2': ['holding-id-2']},
+        )
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertEqual(
+            mock_get.call_args.kwargs['params']['query'],
+            '(instanceId==("instance-id-2") NOT discoverySuppress==true) sortBy id',
+        )
+        # The batch lookups and get_holdings share their results
+        id_list = get_holdings(self.token, self.url, 'instance-id-2', self.tenant)
+        self.assertEqual(id_list, ['holding-id-2'])
+        self.assertEqual(mock_get.call_count, 2)
+        get_holdings_batch(self.token, self.url, ['instance-id-1'], self.tenant)
+        self.assertEqual(mock_get.call_count, 2)
+
+    @patch('folio_curl._SESSION.get')
+    def test_partial_result_not_cached(self, mock_get):
+        # A full page is followed by one that can't be parsed
+        first_page = [
+            {'id': f'holding-id-{i}', 'instanceId': 'instance-id-1'}
+            for i in range(PAGE_SIZE)
+        ]
+        bad_page = unittest.mock.Mock()
+        bad_page.content = b'Token invalid'
+        bad_page.json.side_effect = json.JSONDecodeError('Expecting value', '', 0)
+        mock_get.side_effect = [
+            mock_json_response({'holdingsRecords': first_page}),
+            bad_page,
+        ]
+        with self.assertLogs('folio_curl', level='ERROR'):
+            holdings = get_holdings_batch(
+                self.token, self.url, ['instance-id-1'], self.tenant
+            )
+        self.assertEqual(len(holdings['instance-id-1']), PAGE_SIZE)
+        self.assertIsNone(
+            get_holdings.cache.get((self.url, 'instance-id-1', self.tenant))
+        )
+
+    @patch('folio_curl._SESSION.get')
+    def test_valid_instance_ids(self, mock_get):
+        # Arrange
+        # Create a mock response object with holdings for two instances
+        mock_response = mock_json_response(
+            {
+                'holdingsRecords': [
+                    {'id': 'holding-id-1', 'instanceId': 'instance-id-1'},
+                    {'id': 'holding-id-2', 'instanceId': 'instance-id-2'},
+                    {'id': 'holding-id-3', 'instanceId': 'instance-id-1'},
+                ]
+            }
+        )
+        mock_get.return_value = mock_response
+        instance_ids = ['instance-id-1', 'instance-id-2', 'instance-id-3']
+        # Act
+        holdings = get_holdings_batch(self.token, self.url, instance_ids, self.tenant)
+        # Assert
+        self.assertEqual(
+            holdings,
+            {
+                'instance-id-1': ['holding-id-1', 'holding-id-3'],
+                'instance-id-2': ['holding-id-2'],
+                'instance-id-3': [],
+            },
+        )
+        # Verify that all instance IDs were looked up with a single request
+        mock_get.assert_called_once_with(
+            f'{self.url}/holdings-storage/holdings',
+            headers={
+                'Accept': 'application/json',
+                'Content-Type': 'application/json',
+                'X-Okapi-Tenant': self.tenant,
+                'X-Okapi-Token': self.token,
+            },
+            params={
+                'query': '(instanceId==("instance-id-1" or "instance-id-2" or "instance-id-3") NOT discoverySuppress==true) sortBy id',
+                'limit': PAGE_SIZE,
+                'offset': 0,
+            },
+        )
+
+    @patch('folio_curl._SESSION.get')
+    def test_batches_are_split(self, mock_get):
+        # Arrange
+        # Create more instance IDs than fit into one query
+        instance_ids = [f'instance-id-{i}' for i in range(BATCH_SIZE + 1)]
+
+        def holdings_response(url, headers, params):
+            # Return one holding for the first instance in each query
+            instance_id = params['query'].split('"')[1]
+            return mock_json_response(
+                {
+                    'holdingsRecords': [
+                        {'id': f'{instance_id}-holding', 'instanceId': instance_id}
+                    ]
+                }
+            )
+
+        mock_get.side_effect = holdings_response
+        # Act
+        holdings = get_holdings_batch(self.token, self.url, instance_ids, self.tenant)
+        # Assert
+        # The batches are queried in parallel, but the result keeps the
+        # order of the instance IDs
+        self.assertEqual(list(holdings), instance_ids)
+        self.assertEqual(holdings['instance-id-0'], ['instance-id-0-holding'])
+        self.assertEqual(
+            holdings[f'instance-id-{BATCH_SIZE}'],
+            [f'instance-id-{BATCH_SIZE}-holding'],
+        )
+        self.assertEqual(holdings['instance-id-1'], [])
+        self.assertEqual(mock_get.call_count, 2)
+
+    @patch('folio_curl._SESSION.get')
+    def test_results_are_paged(self, mock_get):
+        # Arrange
+        # Return one full page of holdings followed by a short page
+        full_page = [
+            {'id': f'holding-id-{i}', 'instanceId': 'instance-id-1'}
+            for i in range(PAGE_SIZE)
+        ]
+        short_page = [{'id': 'holding-id-last', 'instanceId': 'instance-id-1'}]
+        mock_get.side_effect = [
+            mock_json_response({'holdingsRecords': full_page}),
+            mock_json_response({'holdingsRecords': short_page}),
+        ]
+        # Act
+        holdings = get_holdings_batch(
+            self.token, self.url, ['instance-id-1'], self.tenant
+        )
+        # Assert
+        self.assertEqual(len(holdings['instance-id-1']), PAGE_SIZE + 1)
+        self.assertEqual(holdings['instance-id-1'][-1], 'holding-id-last')
+        offsets = [call.kwargs['params']['offset'] for call in mock_get.call_args_list]
+        self.assertEqual(offsets, [0, PAGE_SIZE])
+        # Every page is read in the same order
+        for call in mock_get.call_args_list:
+            self.assertTrue(call.kwargs['params']['query'].endswith(' sortBy id'))
+
+
+class TestGetItemsBatch(unittest.TestCase):
+    def setUp(self):
+        # Set up some common variables for testing
+        self.token = "valid-token"
+        self.url = "https://folio.example.com"
+        self.tenant = "testtenant"
+        get_holdings.cache_clear()
+        get_items.cache_clear()
+
+    @patch('folio_curl._SESSION.get')
+    def test_valid_holding_ids(self, mock_get):
+        # Arrange
+        # Create a mock response object with items for one of two holdings
+        mock_response = mock_json_response(
+            {
+                'items': [
+                    {'id': 'item-id-1', 'holdingsRecordId': 'holding-id-1'},
+                    {'id': 'item-id-2', 'holdingsRecordId': 'holding-id-1'},
+                ]
+            }
+        )
+        mock_get.return_value = mock_response
+        # Act
+        items = get_items_batch(
+            self.token, self.url, ['holding-id-1', 'holding-id-2'], self.tenant
+        )
+        # Assert
+        self.assertEqual(
+            items,
+            {'holding-id-1': ['item-id-1', 'item-id-2'], 'holding-id-2': []},
+        )
+        mock_get.assert_called_once_with(
+            f'{self.url}/item-storage/items',
+            headers={
+                'Accept': 'application/json',
+                'Content-Type': 'application/json',
+                'X-Okapi-Tenant': self.tenant,
+                'X-Okapi-Token': self.token,
+            },
+            params={
+                'query': '(holdingsRecordId==("holding-id-1" or "holding-id-2") NOT discoverySuppress==true) sortBy id',
+                'limit': PAGE_SIZE,
+                'offset': 0,
             },
         )
 
@@ -275,8 +1155,8 @@ class TestGetRecords(unittest.TestCase):
         self.tenant = "testtenant"
         self.hrid = "1234567890"
 
-    @patch('folio_curl.get_items')
-    @patch('folio_curl.get_holdings')
+    @patch('folio_curl.get_items_batch')
+    @patch('folio_curl.get_holdings_batch')
     @patch('folio_curl.get_instances')
     @patch('folio_curl.auth')
     def test_valid_hrid(
@@ -290,13 +1170,19 @@ class TestGetRecords(unittest.TestCase):
         mock_auth.return_value = mock_token
         # Make the mock get_instances function return a list of instance IDs
         mock_get_instances.return_value = ["instance-id-1", "instance-id-2"]
-        # Make the mock get_holdings function return a list of lists of holding IDs
-        mock_get_holdings.side_effect = [["holding-id-1"], ["holding-id-2"]]
-        # Make the mock get_items function return a list of item IDs for each holding ID
+        # Make the mock get_holdings_batch function return holding IDs per instance
+        mock_get_holdings.return_value = {
+            "instance-id-1": ["holding-id-1"],
+            "instance-id-2": ["holding-id-2"],
+        }
+        # Make the mock get_items_batch function return item IDs per holding
         # Use a loop to generate item IDs dynamically based on the holding ID
 
-        def generate_item_ids(token, url, holding_id, tenant):
-            return [f"{holding_id}-item-{i}" for i in range(1, 3)]
+        def generate_item_ids(token, url, holding_ids, tenant):
+            return {
+                holding_id: [f"{holding_id}-item-{i}" for i in range(1, 3)]
+                for holding_id in holding_ids
+            }
 
         mock_get_items.side_effect = generate_item_ids
         # Act
@@ -319,42 +1205,28 @@ class TestGetRecords(unittest.TestCase):
             mock_get_instances.assert_called_once_with(
                 mock_token, self.url, self.hrid, self.tenant
             )
-            # Verify that the mock get_holdings function was called twice with different instance IDs
-            calls = [
-                unittest.mock.call(mock_token, self.url, "instance-id-1", self.tenant),
-                unittest.mock.call(mock_token, self.url, "instance-id-2", self.tenant),
-            ]
-            mock_get_holdings.assert_has_calls(calls)
-            # Verify that the mock get_items function was called twice with different holding IDs
-            calls = [
-                unittest.mock.call(mock_token, self.url, "holding-id-1", self.tenant),
-                unittest.mock.call(mock_token, self.url, "holding-id-2", self.tenant),
-            ]
-            mock_get_items.assert_has_calls(calls)
-
-            # Verify that the print function was called four times with empty strings
-            calls = [
-                unittest.mock.call(''),
-                unittest.mock.call(''),
-                unittest.mock.call(''),
-                unittest.mock.call(''),
-            ]
-            mock_print.assert_has_calls(calls)
+            # Verify that the holdings of both instances were looked up at once
+            mock_get_holdings.assert_called_once_with(
+                mock_token, self.url, ["instance-id-1", "instance-id-2"], self.tenant
+            )
+            # Verify that the items of both holdings were looked up at once
+            mock_get_items.assert_called_once_with(
+                mock_token, self.url, ["holding-id-1", "holding-id-2"], self.tenant
+            )
 
-    @patch('folio_curl.get_items')
-    @patch('folio_curl.get_holdings')
+            # Verify that nothing was printed between the lookups
+            mock_print.assert_not_called()
+
+    @patch('folio_curl.get_items_batch')
+    @patch('folio_curl.get_holdings_batch')
     @patch('folio_curl.get_instances')
     @patch('folio_curl.auth')
     def test_invalid_hrid(
         self, mock_auth, mock_get_instances, mock_get_holdings, mock_get_items
     ):
         mock_token = "valid-token"
-        mock_item_ids_1 = ["item-id-1", "item-id-2"]
-        mock_item_ids_2 = ["item-id-3", "item-id-4"]
         mock_auth.return_value = mock_token
         mock_get_instances.return_value = None  # invalid hrid returns None
-        mock_get_holdings.return_value = ["holding-id-1", "holding-id-2"]
-        mock_get_items.side_effect = [mock_item_ids_1, mock_item_ids_2]
         with patch('builtins.print') as mock_print:
             id_list = get_records(
                 self.url, self.username, self.password, self.tenant, "invalid-hrid"
@@ -370,15 +1242,465 @@ class TestGetRecords(unittest.TestCase):
             # the following mocks should not be called for invalid hrid
             mock_get_holdings.assert_not_called()
             mock_get_items.assert_not_called()
-            # verify that print statements are correctly suppressed
-            expected_calls = [unittest.mock.call(''), unittest.mock.call('')]
-            mock_print.assert_has_calls(expected_calls)
+            # verify that nothing was printed between the lookups
+            mock_print.assert_not_called()
+
+    @patch('folio_curl.get_items_batch')
+    @patch('folio_curl.get_holdings_batch')
+    @patch('folio_curl.get_instances')
+    @patch('folio_curl.auth')
+    def test_no_holdings(
+        self, mock_auth, mock_get_instances, mock_get_holdings, mock_get_items
+    ):
+        mock_auth.return_value = "valid-token"
+        mock_get_instances.return_value = ["instance-id-1"]
+        mock_get_holdings.return_value = {"instance-id-1": []}
+        id_list = get_records(
+            self.url, self.username, self.password, self.tenant, self.hrid
+        )
+        self.assertEqual(id_list, [])
+        # no items lookup is needed when there are no holdings
+        mock_get_items.assert_not_called()
+
+
+class TestLookupsAsync(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        # Set up some common variables for testing
+        self.token = "valid-token"
+        self.url = "https://folio.example.com"
+        self.tenant = "testtenant"
+        auth.cache_clear()
+        get_holdings.cache_clear()
+        get_items.cache_clear()
+
+    @patch('folio_curl._SESSION.post')
+    async def test_auth_async(self, mock_post):
+        mock_post.return_value = mock_json_response({})
+        mock_post.return_value.cookies = {'folioAccessToken': 'valid-token'}
+        token = await auth_async(self.url, "testuser", "testpass", self.tenant)
+        self.assertEqual(token, 'valid-token')
+        mock_post.assert_called_once()
+
+    @patch('folio_curl._SESSION.get')
+    async def test_get_holdings_async(self, mock_get):
+        mock_get.return_value = mock_json_response(
+            {'holdingsRecords': [{'id': 'holding-id-1'}]}
+        )
+        id_list = await get_holdings_async(
+            self.token, self.url, "instance-id", self.tenant
+        )
+        self.assertEqual(id_list, ['holding-id-1'])
+
+    @patch('folio_curl._SESSION.get')
+    async def test_get_items_async_concurrent(self, mock_get):
+        # Each request waits until all three are in flight, which only
+        # happens if gather runs them concurrently
+        barrier = threading.Barrier(3, timeout=5)
+
+        def items_response(url, headers, params):
+            barrier.wait()
+            holding_id = params['query'].split('"')[1]
+            return mock_json_response({'items': [{'id': f'{holding_id}-item'}]})
+
+        mock_get.side_effect = items_response
+        holding_ids = ['holding-id-1', 'holding-id-2', 'holding-id-3']
+        results = await asyncio.gather(
+            *(
+                get_items_async(self.token, self.url, h, self.tenant)
+                for h in holding_ids
+            )
+        )
+        self.assertEqual(results, [[f'{h}-item'] for h in holding_ids])
+
+    @patch('folio_curl.ASYNC_CONCURRENCY', 4)
+    @patch('folio_curl._SESSION.get')
+    async def test_get_items_async_limited(self, mock_get):
+        lock = threading.Lock()
+        in_flight = 0
+        max_in_flight = 0
+
+        def items_response(url, headers, params):
+            nonlocal in_flight, max_in_flight
+            with lock:
+                in_flight += 1
+                max_in_flight = max(max_in_flight, in_flight)
+            time.sleep(0.01)
+            with lock:
+                in_flight -= 1
+            return mock_json_response({'items': []})
+
+        mock_get.side_effect = items_response
+        await asyncio.gather(
+            *(
+                get_items_async(self.token, self.url, f'holding-id-{i}', self.tenant)
+                for i in range(20)
+            )
+        )
+        # All lookups ran, but never more than ASYNC_CONCURRENCY at a time
+        self.assertEqual(mock_get.call_count, 20)
+        self.assertLessEqual(max_in_flight, 4)
+
+
+class TestItemsLoader(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        # Set up some common variables for testing
+        self.token = "valid-token"
+        self.url = "https://folio.example.com"
+        self.tenant = "testtenant"
+        get_holdings.cache_clear()
+        get_items.cache_clear()
+
+    @patch('folio_curl._SESSION.get')
+    async def test_same_holding(self, mock_get):
+        mock_get.return_value = mock_json_response(
+            {'items': [{'id': 'item-id-1', 'holdingsRecordId': 'holding-id'}]}
+        )
+        loader = ItemsLoader(self.token, self.url, self.tenant)
+        results = await asyncio.gather(*[loader.load('holding-id') for _ in range(5)])
+        self.assertEqual(results, [['item-id-1']] * 5)
+        # Five concurrent loads of one holding share a single request
+        self.assertEqual(mock_get.call_count, 1)
+
+    @patch('folio_curl._SESSION.get')
+    async def test_several_holdings(self, mock_get):
+        mock_get.return_value = mock_json_response(
+            {
+                'items': [
+                    {'id': 'item-id-1', 'holdingsRecordId': 'holding-id-1'},
+                    {'id': 'item-id-2', 'holdingsRecordId': 'holding-id-2'},
+                ]
+            }
+        )
+        loader = ItemsLoader(self.token, self.url, self.tenant)
+        results = await asyncio.gather(
+            loader.load('holding-id-1'),
+            loader.load('holding-id-2'),
+            loader.load('holding-id-3'),
+        )
+        self.assertEqual(results, [['item-id-1'], ['item-id-2'], []])
+        mock_get.assert_called_once()
+        self.assertEqual(
+            mock_get.call_args.kwargs['params']['query'],
+            '(holdingsRecordId==("holding-id-1" or "holding-id-2" or "holding-id-3") NOT discoverySuppress==true) sortBy id',
+        )
+        # Loads after the batch was sent start a new one, which is
+        # answered from the cache for holdings that had items
+        mock_get.return_value = mock_json_response({'items': []})
+        self.assertEqual(await loader.load('holding-id-1'), ['item-id-1'])
+        self.assertEqual(mock_get.call_count, 1)
+        await loader.load('holding-id-3')
+        self.assertEqual(mock_get.call_count, 2)
+
+    @patch('folio_curl.get_items_batch')
+    async def test_failed_lookup(self, mock_get_items):
+        mock_get_items.side_effect = requests.ConnectionError('connection refused')
+        loader = ItemsLoader(self.token, self.url, self.tenant)
+        results = await asyncio.gather(
+            loader.load('holding-id-1'),
+            loader.load('holding-id-2'),
+            return_exceptions=True,
+        )
+        for result in results:
+            self.assertIsInstance(result, requests.ConnectionError)
+
+
+class TestGetRecordsAsync(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        # Set up some common variables for testing
+        self.url = "https://folio.example.com"
+        self.username = "testuser"
+        self.password = "testpass"
+        self.tenant = "testtenant"
+        self.hrid = "1234567890"
+
+    @patch('folio_curl.get_items_batch')
+    @patch('folio_curl.get_holdings_batch')
+    @patch('folio_curl.get_instances')
+    @patch('folio_curl.auth')
+    async def test_valid_hrid(
+        self, mock_auth, mock_get_instances, mock_get_holdings, mock_get_items
+    ):
+        mock_auth.return_value = "valid-token"
+        mock_get_instances.return_value = ["instance-id-1", "instance-id-2"]
+
+        def generate_holding_ids(token, url, instance_ids, tenant):
+            return {
+                instance_id: [f"{instance_id}-holding-{i}" for i in range(1, 3)]
+                for instance_id in instance_ids
+            }
+
+        def generate_item_ids(token, url, holding_ids, tenant):
+            return {holding_id: [f"{holding_id}-item"] for holding_id in holding_ids}
+
+        mock_get_holdings.side_effect = generate_holding_ids
+        mock_get_items.side_effect = generate_item_ids
+        id_list = await get_records_async(
+            self.url, self.username, self.password, self.tenant, self.hrid
+        )
+        # Item lists are returned in holding order, grouped by instance
+        expected_result = [
+            ["instance-id-1-holding-1-item"],
+            ["instance-id-1-holding-2-item"],
+            ["instance-id-2-holding-1-item"],
+            ["instance-id-2-holding-2-item"],
+        ]
+        self.assertEqual(id_list, expected_result)
+        self.assertEqual(mock_get_holdings.call_count, 1)
+        self.assertEqual(mock_get_items.call_count, 1)
+
+    @patch('folio_curl.get_items_batch')
+    @patch('folio_curl.get_holdings_batch')
+    @patch('folio_curl.get_instances')
+    @patch('folio_curl.auth')
+    async def test_get_records_in_running_loop(
+        self, mock_auth, mock_get_instances, mock_get_holdings, mock_get_items
+    ):
+        # The blocking functions can be called from code with a running
+        # event loop, e.g. in a notebook
+        mock_auth.return_value = "valid-token"
+        mock_get_instances.return_value = ["instance-id-1"]
+        mock_get_holdings.return_value = {"instance-id-1": ["holding-id-1"]}
+        mock_get_items.return_value = {"holding-id-1": ["item-id-1"]}
+        id_list = get_records(
+            self.url, self.username, self.password, self.tenant, self.hrid
+        )
+        self.assertEqual(id_list, [["item-id-1"]])
+
+    @patch('folio_curl.get_items_batch')
+    @patch('folio_curl.get_holdings_batch')
+    @patch('folio_curl.get_instances')
+    @patch('folio_curl.auth')
+    async def test_invalid_hrid(
+        self, mock_auth, mock_get_instances, mock_get_holdings, mock_get_items
+    ):
+        mock_auth.return_value = "valid-token"
+        mock_get_instances.return_value = []
+        id_list = await get_records_async(
+            self.url, self.username, self.password, self.tenant, "invalid-hrid"
+        )
+        self.assertEqual(id_list, [])
+        mock_get_holdings.assert_not_called()
+        mock_get_items.assert_not_called()
+
+
+class TestGetItemRefs(unittest.TestCase):
+    def setUp(self):
+        # Set up some common variables for testing
+        self.url = "https://folio.example.com"
+        self.username = "testuser"
+        self.password = "testpass"
+        self.tenant = "testtenant"
+        self.hrid = "1234567890"
+
+    @patch('folio_curl.get_items_batch')
+    @patch('folio_curl.get_holdings_batch')
+    @patch('folio_curl.get_instances')
+    @patch('folio_curl.auth')
+    def test_valid_hrid(
+        self, mock_auth, mock_get_instances, mock_get_holdings, mock_get_items
+    ):
+        mock_auth.return_value = "valid-token"
+        mock_get_instances.return_value = ["instance-id-1", "instance-id-2"]
+        mock_get_holdings.return_value = {
+            "instance-id-1": ["holding-id-1", "holding-id-2"],
+            "instance-id-2": ["holding-id-3"],
+        }
+        mock_get_items.return_value = {
+            "holding-id-1": ["item-id-1", "item-id-2"],
+            "holding-id-2": [],
+            "holding-id-3": ["item-id-3"],
+        }
+        refs = get_item_refs(
+            self.url, self.username, self.password, self.tenant, self.hrid
+        )
+        # One flat entry per item, without the holding that has no items
+        self.assertEqual(
+            refs,
+            [
+                ItemRef("instance-id-1", "holding-id-1", "item-id-1"),
+                ItemRef("instance-id-1", "holding-id-1", "item-id-2"),
+                ItemRef("instance-id-2", "holding-id-3", "item-id-3"),
+            ],
+        )
+        self.assertEqual(refs[0].item_id, "item-id-1")
+        mock_get_holdings.assert_called_once()
+        mock_get_items.assert_called_once()
+
+    @patch('folio_curl.get_items_batch')
+    @patch('folio_curl.get_holdings_batch')
+    @patch('folio_curl.get_instances')
+    @patch('folio_curl.auth')
+    def test_invalid_hrid(
+        self, mock_auth, mock_get_instances, mock_get_holdings, mock_get_items
+    ):
+        mock_auth.return_value = "valid-token"
+        mock_get_instances.return_value = None
+        refs = get_item_refs(
+            self.url, self.username, self.password, self.tenant, "invalid-hrid"
+        )
+        self.assertEqual(refs, [])
+        mock_get_holdings.assert_not_called()
+        mock_get_items.assert_not_called()
+
+
+class TestGetRecordsThreaded(unittest.TestCase):
+    def setUp(self):
+        # Set up some common variables for testing
+        self.url = "https://folio.example.com"
+        self.username = "testuser"
+        self.password = "testpass"
+        self.tenant = "testtenant"
+        self.hrid = "1234567890"
+
+    @patch('folio_curl.get_items')
+    @patch('folio_curl.get_holdings')
+    @patch('folio_curl.get_instances')
+    @patch('folio_curl.auth')
+    def test_valid_hrid(
+        self, mock_auth, mock_get_instances, mock_get_holdings, mock_get_items
+    ):
+        mock_auth.return_value = "valid-token"
+        mock_get_instances.return_value = ["instance-id-1", "instance-id-2"]
+        holdings = {
+            "instance-id-1": ["holding-id-1", "holding-id-2"],
+            "instance-id-2": ["holding-id-3"],
+        }
+        # All item lookups run at once, and the first one finishes last
+        barrier = threading.Barrier(3, timeout=5)
+
+        def get_holdings(token, url, instance_id, tenant):
+            return holdings[instance_id]
+
+        def get_items(token, url, holding_id, tenant):
+            barrier.wait()
+            if holding_id == "holding-id-1":
+                time.sleep(0.05)
+            return [f"{holding_id}-item"]
+
+        mock_get_holdings.side_effect = get_holdings
+        mock_get_items.side_effect = get_items
+        id_list = get_records_threaded(
+            self.url, self.username, self.password, self.tenant, self.hrid
+        )
+        self.assertEqual(
+            id_list,
+            [["holding-id-1-item"], ["holding-id-2-item"], ["holding-id-3-item"]],
+        )
+        mock_auth.assert_called_once_with(
+            self.url, self.username, self.password, self.tenant
+        )
+        self.assertEqual(mock_get_holdings.call_count, 2)
+        self.assertEqual(mock_get_items.call_count, 3)
+
+    @patch('folio_curl.get_items')
+    @patch('folio_curl.get_holdings')
+    @patch('folio_curl.get_instances')
+    @patch('folio_curl.auth')
+    def test_invalid_hrid(
+        self, mock_auth, mock_get_instances, mock_get_holdings, mock_get_items
+    ):
+        mock_auth.return_value = "valid-token"
+        mock_get_instances.return_value = None
+        id_list = get_records_threaded(
+            self.url, self.username, self.password, self.tenant, "invalid-hrid"
+        )
+        self.assertEqual(id_list, [])
+        mock_get_holdings.assert_not_called()
+        mock_get_items.assert_not_called()
+
+    @patch('folio_curl.get_items')
+    @patch('folio_curl.get_holdings')
+    @patch('folio_curl.get_instances')
+    @patch('folio_curl.auth')
+    def test_holdings_not_parsed(
+        self, mock_auth, mock_get_instances, mock_get_holdings, mock_get_items
+    ):
+        mock_auth.return_value = "valid-token"
+        mock_get_instances.return_value = ["instance-id-1"]
+        mock_get_holdings.return_value = None
+        id_list = get_records_threaded(
+            self.url, self.username, self.password, self.tenant, self.hrid
+        )
+        self.assertEqual(id_list, [])
+        mock_get_items.assert_not_called()
+
+
+class TestGetRecordsBatch(unittest.TestCase):
+    def setUp(self):
+        # Set up some common variables for testing
+        self.url = "https://folio.example.com"
+        self.username = "testuser"
+        self.password = "testpass"
+        self.tenant = "testtenant"
+
+    @patch('folio_curl.get_items_batch')
+    @patch('folio_curl.get_holdings_batch')
+    @patch('folio_curl.get_instances_batch')
+    @patch('folio_curl.auth')
+    def test_several_hrids(
+        self, mock_auth, mock_get_instances, mock_get_holdings, mock_get_items
+    ):
+        mock_auth.return_value = "valid-token"
+        mock_get_instances.return_value = {
+            "hrid-1": ["instance-id-1"],
+            "hrid-2": [],
+            "hrid-3": ["instance-id-3"],
+        }
+        mock_get_holdings.return_value = {
+            "instance-id-1": ["holding-id-1", "holding-id-2"],
+            "instance-id-3": [],
+        }
+        mock_get_items.return_value = {
+            "holding-id-1": ["item-id-1"],
+            "holding-id-2": [],
+        }
+        records = get_records_batch(
+            self.url,
+            self.username,
+            self.password,
+            self.tenant,
+            ["hrid-1", "hrid-2", "hrid-3", "hrid-1"],
+        )
+        self.assertEqual(
+            records, {"hrid-1": [["item-id-1"], []], "hrid-2": [], "hrid-3": []}
+        )
+        mock_get_instances.assert_called_once_with(
+            "valid-token", self.url, ["hrid-1", "hrid-2", "hrid-3"], self.tenant
+        )
+        mock_get_holdings.assert_called_once_with(
+            "valid-token", self.url, ["instance-id-1", "instance-id-3"], self.tenant
+        )
+        mock_get_items.assert_called_once_with(
+            "valid-token", self.url, ["holding-id-1", "holding-id-2"], self.tenant
+        )
+
+    @patch('folio_curl.get_items_batch')
+    @patch('folio_curl.get_holdings_batch')
+    @patch('folio_curl.get_instances_batch')
+    @patch('folio_curl.auth')
+    def test_invalid_hrids(
+        self, mock_auth, mock_get_instances, mock_get_holdings, mock_get_items
+    ):
+        hrids = [f"invalid-hrid-{i}" for i in range(100)]
+        mock_auth.return_value = "valid-token"
+        mock_get_instances.return_value = {hrid: [] for hrid in hrids}
+        records = get_records_batch(
+            self.url, self.username, self.password, self.tenant, hrids
+        )
+        self.assertEqual(records, {hrid: [] for hrid in hrids})
+        # One login and one instance lookup for the whole batch
+        mock_auth.assert_called_once()
+        mock_get_instances.assert_called_once()
+        mock_get_holdings.assert_not_called()
+        mock_get_items.assert_not_called()
 
 
 class TestMain(unittest.TestCase):
-    @patch('folio_curl.get_records')
+    @patch('builtins.print')
+    @patch('folio_curl.logger')
+    @patch('folio_curl.get_records_batch')
     @patch('folio_curl.argparse.ArgumentParser')
-    def test_main(self, mock_parser_class, mock_get_records):
+    def test_main(self, mock_parser_class, mock_get_records, mock_logger, mock_print):
         # Arrange
         # Create a mock parser object and a mock namespace object
         mock_parser = mock_parser_class.return_value
@@ -388,7 +1710,9 @@ class TestMain(unittest.TestCase):
         mock_namespace.username = "admin"
         mock_namespace.password = "secret"
         mock_namespace.tenant = "diku"
-        mock_namespace.hrid = "1234567890"
+        mock_namespace.hrids = ["1234567890"]
+        mock_namespace.hrid_file = None
+        mock_get_records.return_value = {"1234567890": [["item-id-1"]]}
         # Act
         main()
         # Assert
@@ -402,20 +1726,68 @@ class TestMain(unittest.TestCase):
             unittest.mock.call('username', help='FOLIO username'),
             unittest.mock.call('password', help='FOLIO password'),
             unittest.mock.call('tenant', help='FOLIO tenant ID'),
-            unittest.mock.call('hrid', help='Human-readable ID of the record to fetch'),
+            unittest.mock.call(
+                'hrids',
+                nargs='*',
+                metavar='hrid',
+                help='Human-readable ID of a record to fetch',
+            ),
         ]
         mock_parser.add_argument.assert_has_calls(calls)
         # Verify that the mock parser object parsed the arguments
         mock_parser.parse_args.assert_called_once()
-        # Verify that the get_records function was called with the correct arguments
+        # Verify that the curl commands are logged on stderr, away from
+        # the lines of JSON on stdout
+        mock_logger.setLevel.assert_called_once_with(logging.DEBUG)
+        mock_logger.addHandler.assert_called_once()
+        handler = mock_logger.addHandler.call_args.args[0]
+        self.assertIs(handler.stream, sys.stderr)
+        # Verify that the get_records_batch function was called with the correct arguments
         mock_get_records.assert_called_once_with(
             mock_namespace.url,
             mock_namespace.username,
             mock_namespace.password,
             mock_namespace.tenant,
-            mock_namespace.hrid,
+            ["1234567890"],
+        )
+        # Verify that the result was printed as a line of JSON
+        mock_print.assert_called_once_with(
+            '{"hrid": "1234567890", "items": [["item-id-1"]]}'
         )
 
+    @patch('builtins.print')
+    @patch('folio_curl.logger')
+    @patch('folio_curl.get_records_batch')
+    def test_main_several_hrids(self, mock_get_records, mock_logger, mock_print):
+        mock_get_records.side_effect = lambda url, username, password, tenant, hrids: {
+            hrid: [] for hrid in hrids
+        }
+        hrid_file = io.StringIO("3\n\n4\n")
+        argv = ['folio_curl', 'https://folio.example.com', 'admin', 'secret', 'diku']
+        with patch('sys.argv', argv + ['1', '2', '--hrid-file', '-']), patch(
+            'sys.stdin', hrid_file
+        ):
+            main()
+        # Every hrid, from the arguments and the file, is looked up at once
+        mock_get_records.assert_called_once()
+        self.assertEqual(mock_get_records.call_args.args[4], ['1', '2', '3', '4'])
+        self.assertEqual(mock_print.call_count, 4)
+        # Standard input is left open
+        self.assertFalse(hrid_file.closed)
+
+    @patch('builtins.print')
+    @patch('folio_curl.logger')
+    @patch('folio_curl.get_records_batch')
+    def test_main_hrid_file_closed(self, mock_get_records, mock_logger, mock_print):
+        mock_get_records.return_value = {'1': []}
+        hrid_file = io.StringIO("1\n")
+        argv = ['folio_curl', 'https://folio.example.com', 'admin', 'secret', 'diku']
+        with patch('sys.argv', argv + ['--hrid-file', 'hrids.txt']), patch(
+            'argparse.open', return_value=hrid_file, create=True
+        ):
+            main()
+        self.assertTrue(hrid_file.closed)
+
 
 if __name__ == "__main__":
     unittest.main()